@@ -25,15 +25,18 @@ Example::
 
 Admin support should be considered as work-in-progress.
 """
+from bson import json_util
 from django.contrib import admin
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.utils.html import escape
+from django.utils.http import urlencode
 from django.utils.safestring import mark_safe
-import re
+import base64
 
 
 DOCUMENT_PROXY_VAR_NAME = 'document_proxy'
+AFTER_VAR = 'after'
 
 
 def fix_document_for_admin(document):
@@ -45,35 +48,86 @@ def fix_document_for_admin(document):
     return [document]
 
 
+def encode_sort_key(sort_key):
+    """
+    Returns url-safe representation of queryset's sort key.
+    """
+    return base64.urlsafe_b64encode(json_util.dumps(list(sort_key)))
+
+
+def decode_sort_key(value):
+    """
+    Returns sort key encoded by ``encode_sort_key``. Raises ``ValueError``
+    if ``value`` is malformed.
+    """
+    try:
+        sort_key = json_util.loads(base64.urlsafe_b64decode(str(value)))
+    except (TypeError, ValueError):
+        raise ValueError("Malformed sort key: %r" % value)
+    if not isinstance(sort_key, list):
+        raise ValueError("Malformed sort key: %r" % value)
+    return tuple(sort_key)
+
+
 class DocumentChangeList(object):
+    """
+    Change list paginated by sort keys (see ``QuerySet.paginate_by_key``)
+    rather than page numbers, so the cost of a page doesn't depend on its
+    position and total count of items is never computed.
+    """
     def __init__(self, request, model_admin, results):
         self.model_admin = model_admin
         self.document = model_admin.model
         self.opts = self.document._meta
-        self.result_list = results
-        self.result_count = self.full_result_count = len(results)
+        self.params = dict(request.GET.items())
         self.date_hierarchy = None
         self.list_display = []
         self.formset = None
-        self.page_num = int(request.GET.get('page', 0))
 
-        self.multi_page = self.result_count > self.model_admin.list_per_page
-        self.show_all = not self.multi_page
-        self.can_show_all = self.show_all
-
-        self.paginator = self.model_admin.get_paginator(request, results,
-            self.model_admin.list_per_page)
+        self.after = None
+        if request.GET.get(AFTER_VAR):
+            try:
+                self.after = decode_sort_key(request.GET[AFTER_VAR])
+                results.after(self.after)
+            except ValueError:
+                # tampered or truncated link, start from the first page
+                self.after = None
+                self.params.pop(AFTER_VAR, None)
+        self.result_list, self.next_key = results.paginate_by_key(
+            self.model_admin.list_per_page, after=self.after)
+        self.result_count = len(self.result_list)
+        # total count is never computed
+        self.full_result_count = None
+        self.search_field = model_admin.search_field
+        self.query = request.GET.get('query', '')
+
+        self.multi_page = self.after is not None or self.next_key is not None
+        self.show_all = False
+        self.can_show_all = False
 
         self.lookup_opts = {}
 
     def get_ordering_field_columns(self):
         return []
 
-    def get_query_string(self, info):
-        return '?page={p}'.format(**info)
+    def get_query_string(self, new_params=None, remove=None):
+        params = self.params.copy()
+        for key in remove or []:
+            params.pop(key, None)
+        params.update(new_params or {})
+        return '?%s' % urlencode(sorted(params.items()))
+
+    def get_first_page_url(self):
+        return self.get_query_string(remove=[AFTER_VAR])
+
+    def get_next_page_url(self):
+        if self.next_key is None:
+            return None
+        return self.get_query_string({AFTER_VAR: encode_sort_key(
+            self.next_key)})
 
     def get_results(self):
-        return self.paginator.page(self.page_num + 1).object_list
+        return self.result_list
 
 
 class DocumentProxy(object):
@@ -106,19 +160,43 @@ class DocumentAdmin(admin.ModelAdmin):
     fields = []
     document_list_display = ['_id']
     search_field = 'title'
+    # lookup used if ``search_field`` is a prefix of an index; unlike the
+    # ``icontains`` fallback it's case sensitive and matches only beginnings
+    # of values (``istartswith`` is case insensitive, but it scans the whole
+    # index)
+    prefix_search_lookup = 'startswith'
     changelist_cls = DocumentChangeList
 
     def get_document_proxy(self):
         return DocumentProxy(self)
 
+    def get_search_lookup(self):
+        """
+        Returns cheapest lookup available for ``search_field``: ``search``
+        if it's covered by a text index, ``prefix_search_lookup`` if it's
+        a prefix of an index and ``icontains`` otherwise.
+        """
+        indexes = self.model._meta.indexes
+        if any(self.search_field in index.text_fields for index in indexes):
+            return 'search'
+        if any(index.keys[0][0] == self.search_field for index in indexes):
+            return self.prefix_search_lookup
+        return 'icontains'
+
+    def get_search_results(self, items, query):
+        lookup = self.get_search_lookup()
+        if lookup == 'search':
+            return items.search(query)
+        return items.filter(**{'%s__%s' % (self.search_field, lookup): query})
+
     @admin.options.csrf_protect_m
     def changelist_view(self, request, extra_context=None):
 
 
         items = self.model.objects.all()
         query = request.GET.get('query')
-        if self.search_field and query and re.match(r'[a-z \d]+', query, re.IGNORECASE):
-            items = items.filter(**{'%s__icontains' % self.search_field: query})
+        if self.search_field and query:
+            items = self.get_search_results(items, query)
 
         changelist = self.changelist_cls(request, self, items)
 
@@ -0,0 +1,58 @@
+"""
+Aggregates which may be passed to ``QuerySet.aggregate`` and
+``QuerySet.annotate``. Each of them is compiled into an accumulator of
+``$group`` pipeline stage, so the work is done by the server::
+
+    Item.objects.filter(status='paid').aggregate(total=Sum('price'))
+    Item.objects.values('status').annotate(count=Count(), total=Sum('price'))
+
+"""
+
+
+class Aggregate(object):
+    operator = None
+    empty_value = None
+
+    def __init__(self, field):
+        self.field = field
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.field)
+
+    @property
+    def path(self):
+        return self.field.replace('__', '.')
+
+    def as_accumulator(self):
+        return {self.operator: '$' + self.path}
+
+
+class Count(Aggregate):
+    """
+    Counts documents (within a group). ``field`` is accepted for
+    compatibility with Django's ``Count`` but isn't used.
+    """
+    operator = '$sum'
+    empty_value = 0
+
+    def __init__(self, field=None):
+        super(Count, self).__init__(field)
+
+    def as_accumulator(self):
+        return {self.operator: 1}
+
+
+class Sum(Aggregate):
+    operator = '$sum'
+
+
+class Avg(Aggregate):
+    operator = '$avg'
+
+
+class Min(Aggregate):
+    operator = '$min'
+
+
+class Max(Aggregate):
+    operator = '$max'
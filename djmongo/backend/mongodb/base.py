@@ -1,6 +1,8 @@
 #from django.conf import settings
 import django
+import os
 import pymongo
+import threading
 from django.core.exceptions import ImproperlyConfigured
 from django.db.backends.creation import BaseDatabaseCreation
 from django.db.backends import BaseDatabaseFeatures
@@ -8,12 +10,63 @@ from django.db.backends import BaseDatabaseIntrospection
 from django.db.backends import BaseDatabaseOperations
 from django.db.backends import BaseDatabaseWrapper
 from djmongo.utils import can_drop_collection
+from djmongo.utils import get_read_preference
 
 
 DEFAULT_HOST = 'localhost'
 DEFAULT_PORT = 27017
 
 
+class SharedConnections(object):
+    """
+    Process-wide registry of pooled connections, one for each unique
+    connection uri and options. Registry is emptied after the process is
+    forked, so children never reuse sockets of their parent.
+    """
+
+    def __init__(self):
+        self.connections = {}
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def get(self, uri, **options):
+        key = (uri, repr(sorted(options.items())))
+        self.lock.acquire()
+        try:
+            if self.pid != os.getpid():
+                self.connections = {}
+                self.pid = os.getpid()
+            if key not in self.connections:
+                if options.get('replicaSet'):
+                    wrapper_class = ReplicaSetConnectionWrapper
+                else:
+                    wrapper_class = ConnectionWrapper
+                self.connections[key] = wrapper_class(host=uri, **options)
+            return self.connections[key]
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.connections = {}
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        """
+        Forgets connections without acquiring the lock, which is replaced by
+        a new one. To be called in a forked process, where the lock may be
+        held by a thread of the parent which doesn't exist anymore.
+        """
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.pid = os.getpid()
+
+
+shared_connections = SharedConnections()
+
+
 class FakeCursor(object):
     lastrowid = None
     def execute(self, *args, **kwargs):
@@ -48,35 +101,74 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     def cursor(self):
         return FakeCursor()
 
+    def close(self):
+        # Connection is shared with other wrappers (threads) of this process
+        # and keeps its pool open between requests.
+        pass
+
     def get_test_db_name(self):
         return self.settings_dict['TEST_NAME']
 
+    def get_hosts(self):
+        """
+        Returns list of ``host:port`` seeds. ``HOST`` may be a list or comma
+        separated string of hosts (i.e. replica set members), ``PORT`` is
+        used for hosts given without one.
+        """
+        hosts = self.settings_dict.get('HOST') or DEFAULT_HOST
+        port = self.settings_dict.get('PORT') or DEFAULT_PORT
+        if isinstance(hosts, basestring):
+            hosts = hosts.split(',')
+        seeds = []
+        for host in hosts:
+            host = host.strip()
+            if ':' not in host:
+                host = ':'.join((host, str(port)))
+            seeds.append(host)
+        return seeds
+
     def get_connection_uri(self):
         uri = 'mongodb://'
         user, password = self.settings_dict.get('USER'), self.settings_dict.get(
             'PASSWORD')
-        host = self.settings_dict['HOST'] or DEFAULT_HOST
-        port = self.settings_dict['PORT'] or DEFAULT_PORT
+        hosts = ','.join(self.get_hosts())
         if user and password:
             uri += ':'.join((user, password)) + '@'
         elif not (user or password):
             # no need to specify protocol uri if not user/password are used
             # - otherwise warning would be raied by pymongo
-            return ':'.join((host, str(port)))
-        uri += ':'.join((host, str(port)))
+            return hosts
+        uri += hosts
         uri = '/'.join((uri, self.settings_dict['NAME']))
         return uri
 
+    def get_connection_options(self):
+        """
+        Returns keyword arguments for the connection, taken from ``OPTIONS``
+        of the settings dictionary (i.e. ``max_pool_size``,
+        ``waitQueueTimeoutMS``, ``socketTimeoutMS``, ``connectTimeoutMS``,
+        ``replicaSet``, ``read_preference`` or default write concern - ``w``,
+        ``j``, ``wtimeout``).
+        """
+        options = dict(self.settings_dict.get('OPTIONS') or {})
+        if 'read_preference' in options:
+            options['read_preference'] = get_read_preference(
+                options['read_preference'])
+        return options
+
     def get_connection(self):
-        return ConnectionWrapper(host=self.get_connection_uri())
+        return shared_connections.get(self.get_connection_uri(),
+            **self.get_connection_options())
 
     def get_database(self, database):
         return getattr(self.get_connection(), database)
 
     @property
     def db(self):
-        if not hasattr(self, '_db'):
+        key = (os.getpid(), self.settings_dict['NAME'])
+        if getattr(self, '_db_key', None) != key:
             self._db = self.get_database(self.settings_dict['NAME'])
+            self._db_key = key
         return self._db
 
     def clear_all_collections(self):
@@ -144,3 +236,20 @@ class ConnectionWrapper(pymongo.Connection):
     def rollback(self):
         pass
 
+
+class ReplicaSetConnectionWrapper(pymongo.ReplicaSetConnection):
+    """
+    Connection to a replica set; reads are routed to members chosen by the
+    read preference.
+    """
+
+    def __init__(self, host=None, **options):
+        super(ReplicaSetConnectionWrapper, self).__init__(hosts_or_uri=host,
+            **options)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
@@ -1,28 +1,75 @@
+import copy
 import inspect
 import pymongo
+import warnings
+from bson import BSON
+from bson import ObjectId
 from django.db import connections
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.utils.datastructures import SortedDict
+from djmongo import instrumentation
+from djmongo.identitymap import get_identity_map
+from djmongo.querycache import invalidate
+from djmongo.utils import get_changes
+from djmongo.utils import get_read_preference
 from djmongo.utils import is_mongodb_connection
+from djmongo.exceptions import BulkCreateError
 from djmongo.exceptions import DjongoError
+from djmongo.lookups import compile_filters
+from djmongo.lookups import compile_update
 from djmongo.querysets import QuerySet
 
 
+class IndexConflictWarning(RuntimeWarning):
+    """
+    Issued if declared index has the same keys as an existing one, but
+    different options (server refuses to create such index).
+    """
+
+
 class Index(object):
     ASCENDING = pymongo.ASCENDING
     DESCENDING = pymongo.DESCENDING
+    TEXT = 'text'
 
-    __slots__ = ('keys', 'unique', 'name')
+    __slots__ = ('keys', 'unique', 'name', 'sparse', 'partial_filter',
+        'expire_after_seconds', 'background')
 
-    def __init__(self, keys, unique=False, name=None):
+    def __init__(self, keys, unique=False, name=None, sparse=False,
+                 partial_filter=None, expire_after_seconds=None,
+                 background=False):
+        """
+        :param keys: field name or list of ``(field, direction)`` pairs; order
+          of the pairs is preserved
+        :param sparse: if documents without indexed fields should be skipped
+        :param partial_filter: filter document, only matching documents would
+          be indexed
+        :param expire_after_seconds: makes TTL index
+        :param background: if index should be build in the background
+        """
         if isinstance(keys, basestring):
             keys = [(keys, Index.ASCENDING)]
-        self.keys = set(keys)
+        self.keys = tuple((key, order) for key, order in keys)
         self.unique = unique
         self.name = name
+        self.sparse = sparse
+        self.partial_filter = partial_filter
+        self.expire_after_seconds = expire_after_seconds
+        self.background = background
 
     def __eq__(self, other):
-        return self.keys == other.keys and self.unique == other.unique
+        return (self.get_comparable_keys() == other.get_comparable_keys() and
+                self.unique == other.unique and
+                self.sparse == other.sparse and
+                self.partial_filter == other.partial_filter and
+                self.expire_after_seconds == other.expire_after_seconds)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.get_comparable_keys(), self.unique))
 
     def __cmp__(self, other):
         return cmp(repr(self), repr(other))
@@ -31,6 +78,12 @@ class Index(object):
         result = '<Index: {keys}'.format(keys=self.descriptive_keys())
         if self.unique:
             result += ' | UNIQUE'
+        if self.sparse:
+            result += ' | SPARSE'
+        if self.partial_filter:
+            result += ' | PARTIAL: {0!r}'.format(self.partial_filter)
+        if self.expire_after_seconds is not None:
+            result += ' | TTL: {0}s'.format(self.expire_after_seconds)
         result += '>'
         return result
 
@@ -38,15 +91,76 @@ class Index(object):
         """
         Returns keys representation.
         """
-        return [(unicode(key), order == Index.ASCENDING and 'Ascending' or 'Descending')
-                for key, order in sorted(self.keys)]
+        names = {Index.ASCENDING: 'Ascending', Index.DESCENDING: 'Descending',
+            Index.TEXT: 'Text'}
+        return [(unicode(key), names.get(order, unicode(order)))
+                for key, order in self.keys]
+
+    @property
+    def is_text(self):
+        return any(order == Index.TEXT for key, order in self.keys)
+
+    @property
+    def text_fields(self):
+        return [key for key, order in self.keys if order == Index.TEXT]
+
+    def get_comparable_keys(self):
+        """
+        Returns keys with all text fields replaced by a single ``(sorted
+        text fields, 'text')`` pair, as order of text fields doesn't matter.
+        """
+        keys = []
+        for key, order in self.keys:
+            if order != Index.TEXT:
+                keys.append((key, order))
+            elif not any(order == Index.TEXT for key, order in keys):
+                keys.append((tuple(sorted(self.text_fields)), Index.TEXT))
+        return tuple(keys)
+
+    def get_options(self):
+        """
+        Returns options passed to ``create_index``.
+        """
+        options = {'unique': self.unique, 'background': self.background}
+        if self.name:
+            options['name'] = self.name
+        if self.sparse:
+            options['sparse'] = True
+        if self.partial_filter:
+            options['partialFilterExpression'] = self.partial_filter
+        if self.expire_after_seconds is not None:
+            options['expireAfterSeconds'] = self.expire_after_seconds
+        return options
 
-    def create_for_collection(self, collection):
-        collection.create_index(list(self.keys), unique=self.unique)
+    @classmethod
+    def from_index_information(cls, name, info):
+        """
+        Returns index for an item of pymongo's ``index_information``. Text
+        indexes are stored with ``_fts``/``_ftsx`` keys in place of the text
+        fields, which are given by ``weights``.
+        """
+        keys = []
+        for key, order in info['key']:
+            if key == '_fts':
+                keys += [(field, Index.TEXT)
+                    for field in sorted(info.get('weights', {}))]
+            elif key != '_ftsx':
+                keys.append((key, order))
+        return cls(keys=keys, unique=info.get('unique', False),
+            name=name, sparse=info.get('sparse', False),
+            partial_filter=info.get('partialFilterExpression'),
+            expire_after_seconds=info.get('expireAfterSeconds'))
+
+    def create_for_collection(self, collection, background=False):
+        options = self.get_options()
+        options['background'] = self.background or background
+        collection.create_index(list(self.keys), **options)
 
 
 class Manager(object):
     document = None
+    bulk_batch_size = 1000
+    in_bulk_batch_size = 1000
 
     def __init__(self):
         pass
@@ -54,23 +168,39 @@ class Manager(object):
     def get_query_set(self):
         return QuerySet(self.document)
 
-    def ensure_indexes(self, collection):
+    def ensure_indexes(self, collection=None, background=True):
+        """
+        Creates indexes from document's ``Meta.indexes`` which are missing at
+        the collection. Returns list of created indexes.
+
+        Indexes are matched by their keys; if existing index has different
+        options, ``IndexConflictWarning`` is issued and it's left intact (it
+        has to be dropped to apply new options).
+        """
+        if collection is None:
+            collection = self.collection
+        existing = dict((index.get_comparable_keys(), index)
+            for index in self.get_indexes())
+        created = []
         for index in self.document._meta.indexes:
-            index.create_for_collection(collection)
+            current = existing.get(index.get_comparable_keys())
+            if current is None:
+                index.create_for_collection(collection, background=background)
+                created.append(index)
+            elif current != index:
+                warnings.warn("%r of %s conflicts with existing %r; drop it "
+                    "to apply new options" % (index,
+                    self.document._meta.collection_name, current),
+                    IndexConflictWarning)
+        self.document._indexes_already_created = True
+        return created
 
     @property
     def connection(self):
-
         conn = connections[self.document._meta.using]
         if not is_mongodb_connection(conn):
             raise ImproperlyConfigured("Must be used with mongodb backend "
                 "(got %r)" % conn)
-
-        if (self.document.auto_ensure_indexes and
-            not self.document._indexes_already_created):
-            self.ensure_indexes(self._get_collection(conn.db))
-            self.document._indexes_already_created = True
-
         return conn
 
     @property
@@ -80,23 +210,144 @@ class Manager(object):
     def _get_collection(self, db=None):
         if db is None:
             db = self.db
-        return getattr(db, self.document._meta.collection_name)
+        collection = getattr(db, self.document._meta.collection_name)
+        read_preference = self.document._meta.read_preference
+        if read_preference is not None:
+            collection.read_preference = get_read_preference(read_preference)
+        if instrumentation.is_enabled(self.connection):
+            collection = instrumentation.InstrumentedCollection(collection,
+                self.document, self.connection)
+        return collection
 
     @property
     def collection(self):
         return self._get_collection()
 
+    def get_write_options(self, safe=True, write_concern=None):
+        """
+        Returns keyword arguments for write operations. ``write_concern``
+        (dictionary with ``w``, ``j``, ``wtimeout`` or ``fsync`` keys) takes
+        precedence, then ``safe=False`` (unacknowledged write, ``w=0``), then
+        document's ``Meta.write_concern``. Otherwise writes are acknowledged
+        with connection defaults (``OPTIONS`` of the database settings).
+        """
+        if write_concern is not None:
+            return dict(write_concern)
+        if not safe:
+            return {'w': 0}
+        if self.document._meta.write_concern is not None:
+            return dict(self.document._meta.write_concern)
+        return {'safe': True}
+
+    def _collection_changed(self):
+        """
+        Called after documents of the collection were modified (other than by
+        ``Document.save``/``delete``). Invalidates cached query results and
+        forgets documents kept in the identity map.
+        """
+        invalidate(self.document)
+        identities = get_identity_map()
+        if identities is not None:
+            identities.clear(self.document._meta.collection_name)
+
     def count(self, **filters):
         return self.filter(**filters).count()
 
-    def create(self, **kwargs):
+    def create(self, write_concern=None, **kwargs):
         document = self.document(**kwargs)
-        document.save()
+        document.save(write_concern=write_concern)
         return document
 
+    def bulk_create(self, documents, batch_size=None, ordered=False, safe=True,
+                    write_concern=None):
+        """
+        Inserts given ``documents`` using multi-document inserts. Documents
+        are grouped into batches of at most ``batch_size`` items which also
+        fit into server's max message size. ``_id`` is filled in for each
+        document.
+
+        If ``ordered`` is ``False`` remaining documents (and batches) are
+        inserted even if some of them fail. Failed batches are reported by
+        ``BulkCreateError`` raised after whole load is processed. Server
+        reports only the last error of a batch, so documents of a failed
+        batch are looked up by ``_id`` to tell which of them were inserted
+        (see ``_get_failed_documents``).
+        """
+        documents = list(documents)
+        collection = self.collection
+        options = self.get_write_options(safe, write_concern)
+        errors = []
+        for batch in self._get_insert_batches(documents, batch_size):
+            preset_ids = [document.id is not None for document in batch]
+            try:
+                ids = collection.insert([document.data for document in batch],
+                    continue_on_error=not ordered, **options)
+            except pymongo.errors.OperationFailure, err:
+                stored = collection.find({'_id': {'$in': [document.id
+                    for document in batch if document.id is not None]}},
+                    fields={'_id': True})
+                errors.append((self._get_failed_documents(batch, preset_ids,
+                    [item['_id'] for item in stored]), err))
+                if ordered:
+                    break
+                continue
+            for document, _id in zip(batch, ids):
+                document.data[u'_id'] = _id
+                document._snapshot()
+        self._collection_changed()
+        if errors:
+            raise BulkCreateError(errors, documents)
+        return documents
+
+    def _get_failed_documents(self, batch, preset_ids, stored_ids):
+        """
+        Returns documents of a failed ``batch`` which were not inserted, given
+        ``_id`` values of the batch found in the collection afterwards.
+        Documents which had ``_id`` before the insert are always returned, as
+        they can't be told apart from the duplicates they may collide with.
+        ``_id`` assigned by pymongo to the failed documents is removed, so
+        they may be saved again.
+        """
+        failed = []
+        for document, preset_id in zip(batch, preset_ids):
+            if not preset_id and document.id in stored_ids:
+                document._snapshot()
+                continue
+            if not preset_id:
+                document.data.pop('_id', None)
+            failed.append(document)
+        return failed
+
+    def insert_many(self, data, batch_size=None, ordered=False, safe=True,
+                    write_concern=None):
+        """
+        Same as ``bulk_create`` but takes raw data dictionaries.
+        """
+        documents = [self.document(data=item) for item in data]
+        return self.bulk_create(documents, batch_size=batch_size,
+            ordered=ordered, safe=safe, write_concern=write_concern)
+
+    def _get_insert_batches(self, documents, batch_size=None, max_size=None):
+        batch_size = batch_size or self.bulk_batch_size
+        if max_size is None:
+            connection = self.db.connection
+            max_size = (getattr(connection, 'max_message_size', None) or
+                connection.max_bson_size * 2)
+        batch, batch_bytes = [], 0
+        for document in documents:
+            size = len(BSON.encode(document.data))
+            if batch and (len(batch) >= batch_size or
+                          batch_bytes + size > max_size):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(document)
+            batch_bytes += size
+        if batch:
+            yield batch
+
     def get_indexes(self):
-        return [Index(keys=index['key'], unique=index.get('unique', False), name=name)
-                for name, index in self.collection.index_information().items()]
+        return [Index.from_index_information(name, info)
+                for name, info in self.collection.index_information().items()]
 
     def all(self):
         return self.get_query_set().all()
@@ -105,30 +356,189 @@ class Manager(object):
         return self.get_query_set().filter(**filters)
 
     def get(self, **filters):
-        return self.get_query_set().get(**filters)
+        """
+        Returns single document matching ``filters``. Documents fetched by
+        ``_id`` are kept in the identity map, if it's active.
+        """
+        identities = get_identity_map()
+        if (identities is None or filters.keys() != ['_id'] or
+            not self.is_default()):
+            return self.get_query_set().get(**filters)
+        document = identities.get(self.document, filters['_id'])
+        if document is None:
+            document = self.get_query_set().get(**filters)
+            identities.add(document)
+        return document
+
+    def in_bulk(self, ids, fields=None):
+        """
+        Returns dictionary of documents with given ``ids`` (missing ones are
+        skipped), fetched with a single ``$in`` query for each
+        ``in_bulk_batch_size`` ids. Documents are kept in the identity map,
+        if it's active.
+
+        :param fields: if given, only these fields are fetched (such
+          documents are not kept in the identity map)
+        """
+        identities = get_identity_map()
+        result = {}
+        missing = []
+        for _id in ids:
+            if _id in result:
+                continue
+            document = None
+            if identities is not None:
+                document = identities.get(self.document, _id)
+            if document is not None:
+                result[_id] = document
+            else:
+                result[_id] = None
+                missing.append(_id)
+        queryset = self.get_query_set()
+        if fields is not None:
+            queryset = queryset.only(*fields)
+        batch_size = self.in_bulk_batch_size
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for document in queryset.filter(_id__in=batch):
+                result[document.id] = document
+                if identities is not None and fields is None:
+                    identities.add(document)
+        return dict((_id, document) for _id, document in result.items()
+            if document is not None)
+
+    def get_or_none(self, **filters):
+        return self.get_query_set().get_or_none(**filters)
+
+    def first(self):
+        return self.get_query_set().first()
+
+    def last(self):
+        return self.get_query_set().last()
+
+    def exists(self, **filters):
+        return self.filter(**filters).exists()
 
     def pluck(self, *fields, **filters):
         return self.filter(**filters).pluck(*fields)
 
-    def upsert(self, data, safe=True, **filters):
-        result = self.collection.update(filters, data, upsert=True, safe=safe)
-        if safe:
+    def values(self, *fields):
+        return self.get_query_set().values(*fields)
+
+    def aggregate(self, **aggregates):
+        return self.get_query_set().aggregate(**aggregates)
+
+    def distinct(self, field):
+        return self.get_query_set().distinct(field)
+
+    def search(self, text, language=None):
+        return self.get_query_set().search(text, language=language)
+
+    def only(self, *fields):
+        return self.get_query_set().only(*fields)
+
+    def using_read_preference(self, read_preference, tag_sets=None):
+        return self.get_query_set().using_read_preference(read_preference,
+            tag_sets=tag_sets)
+
+    def defer(self, *fields):
+        return self.get_query_set().defer(*fields)
+
+    def upsert(self, data, safe=True, write_concern=None, **filters):
+        result = self.collection.update(filters, data, upsert=True,
+            **self.get_write_options(safe, write_concern))
+        self._collection_changed()
+        if result:
             data['_id'] = result.get('upserted')
         return self.document(data=data)
 
-    def update_raw(self, data, safe=True, upsert=False, multi=True):
+    def find_and_modify(self, filters, update, new=True, upsert=False,
+                        fields=None, sort=None, write_concern=None):
+        """
+        Atomically modifies single document matching ``filters`` (first one
+        by ``sort`` ordering) and returns it (or ``None``) - with a single
+        round trip.
+
+        :param filters: dictionary of lookups, same as for ``filter``
+        :param update: update document; keys without ``$`` are compiled just
+          like arguments of ``QuerySet.update`` (i.e. ``inc__counter``)
+        :param new: if modified document (not original one) should be
+          returned
+        :param fields: list of fields to return
+        :param sort: list of fields, same as for ``order_by``
+        :param write_concern: overrides document's ``Meta.write_concern``
+          (requires MongoDB 3.2)
+        """
+        document, last_error = self._find_and_modify(filters, update,
+            new=new, upsert=upsert, fields=fields, sort=sort,
+            write_concern=write_concern)
+        return document
+
+    def _find_and_modify(self, filters, update, new=True, upsert=False,
+                         fields=None, sort=None, write_concern=None):
+        if not all(key.startswith('$') for key in update):
+            update = compile_update(update)
+        options = {'new': new, 'upsert': upsert}
+        # command takes write concern as a document (connection defaults
+        # apply without it)
+        write_concern = self.get_write_options(write_concern=write_concern)
+        write_concern.pop('safe', None)
+        if write_concern:
+            options['writeConcern'] = write_concern
+        if fields is not None:
+            options['fields'] = dict((field, True) for field in fields)
+        if sort:
+            options['sort'] = QuerySet(self.document,
+                ordering=sort).get_ordering().items()
+        result = self.collection.find_and_modify(compile_filters(filters),
+            update, full_response=True, **options)
+        self._collection_changed()
+        value = result.get('value')
+        document = self.document.from_db(value) if value else None
+        return document, result.get('lastErrorObject', {})
+
+    def get_or_create(self, defaults=None, write_concern=None, **filters):
+        """
+        Returns ``(document, created)`` pair for a document matching
+        ``filters``; if there is no such document one is created from
+        ``filters`` and ``defaults``, atomically. A unique index on
+        filtered fields guards against duplicates made by concurrent upserts.
+        """
+        insert_data = dict(defaults or {})
+        if not insert_data:
+            insert_data['_id'] = ObjectId()
+        document, last_error = self._find_and_modify(filters,
+            {'$setOnInsert': insert_data}, new=True, upsert=True,
+            write_concern=write_concern)
+        return document, not last_error.get('updatedExisting', False)
+
+    def update_or_create(self, defaults=None, write_concern=None, **filters):
+        """
+        Same as ``get_or_create`` but existing document is updated with
+        ``defaults`` (``$set``).
+        """
+        if not defaults:
+            return self.get_or_create(write_concern=write_concern, **filters)
+        document, last_error = self._find_and_modify(filters,
+            {'$set': defaults}, new=True, upsert=True,
+            write_concern=write_concern)
+        return document, not last_error.get('updatedExisting', False)
+
+    def update_raw(self, data, safe=True, upsert=False, multi=True,
+                   write_concern=None):
         return self.get_query_set().update_raw(data, safe=safe, upsert=upsert,
-            multi=multi)
+            multi=multi, write_concern=write_concern)
 
-    def update(self, safe=True, upsert=False, **data):
-        return self.update_raw(data, safe=safe, upsert=upsert)
+    def update(self, safe=True, upsert=False, write_concern=None, **data):
+        return self.get_query_set().update(safe=safe, upsert=upsert,
+            write_concern=write_concern, **data)
 
     def is_default(self):
         return self == self.document._default_manager
 
 
 META_KEYS = ['using', 'collection_name', 'indexes', 'verbose_name',
-    'verbose_name_plural']
+    'verbose_name_plural', 'read_preference', 'write_concern', 'query_cache']
 
 class Options(object):
 
@@ -141,6 +551,9 @@ class Options(object):
                 Document.__name__.lower()),
             'verbose_name': Document.__name__,
             'indexes': [],
+            'read_preference': None,
+            'write_concern': None,
+            'query_cache': False,
         }
 
     @classmethod
@@ -171,6 +584,43 @@ class Options(object):
         return opts
 
 
+# documents keyed by their database and collection, so that a class
+# redefined for the same collection (i.e. in tests) replaces the old one
+_documents = SortedDict()
+
+
+def get_documents():
+    """
+    Returns list of defined ``Document`` subclasses - the last one defined for
+    each collection.
+    """
+    return _documents.values()
+
+
+def ensure_all_indexes(using=None, background=True, force=False):
+    """
+    Creates missing indexes for all documents with ``auto_ensure_indexes``
+    set. Indexes are ensured once per process, unless ``force`` is given.
+    Returns dictionary of documents and indexes created for them.
+
+    :param using: if given, only documents stored at that connection are
+      processed
+    :param background: if indexes should be build in the background
+    """
+    result = {}
+    for document in get_documents():
+        opts = document._meta
+        if not (document.auto_ensure_indexes and opts.using and opts.indexes):
+            continue
+        if using is not None and opts.using != using:
+            continue
+        if document._indexes_already_created and not force:
+            continue
+        manager = document._default_manager
+        result[document] = manager.ensure_indexes(background=background)
+    return result
+
+
 class DocumentBase(type):
 
     def __new__(cls, name, bases, attrs):
@@ -181,39 +631,188 @@ class DocumentBase(type):
         new_class = super(DocumentBase, cls).__new__(cls, name, bases, attrs)
         manager.document = attrs['objects'].document = new_class
         new_class._meta = Options.for_class(new_class, opts)
+        if bases != (object,):
+            opts = new_class._meta
+            _documents.pop((opts.using, opts.collection_name), None)
+            _documents[(opts.using, opts.collection_name)] = new_class
         return new_class
 
 
+class AsyncManagerDescriptor(object):
+    """
+    Returns non-blocking manager (``djmongo.nonblocking.AsyncManager``) of
+    the document class. Tornado is imported only when it's accessed; the
+    attribute is missing if it's not installed.
+    """
+
+    def __get__(self, instance, owner):
+        try:
+            from djmongo.nonblocking import AsyncManager
+        except ImportError, err:
+            raise AttributeError("Non-blocking API is not available: %s" %
+                err)
+        return AsyncManager(owner)
+
+
 class Document(object):
     __metaclass__ = DocumentBase
 
     _indexes_already_created = False
     auto_ensure_indexes = True
+    aobjects = AsyncManagerDescriptor()
 
     def __init__(self, data=None):
+        self._pending_snapshot = False
+        self._saved_data = None
         self.data = data or {}
 
+    @classmethod
+    def from_db(cls, data):
+        """
+        Returns document for ``data`` fetched from the database. Such document
+        sends only changed keys when saved. Data is copied (to find changes
+        later) only when it's first accessed, as ``data`` is the only way to
+        modify it.
+        """
+        document = cls(data=data)
+        document._pending_snapshot = True
+        return document
+
+    def _snapshot(self):
+        self._saved_data = copy.deepcopy(self._data)
+        self._pending_snapshot = False
+
+    def _get_data(self):
+        if self._pending_snapshot:
+            self._snapshot()
+        return self._data
+
+    def _set_data(self, data):
+        if self._pending_snapshot:
+            self._snapshot()
+        self._data = data
+
+    data = property(_get_data, _set_data)
+
     def __eq__(self, other):
         if self.id is not None:
             return self.id == other.id
-        return self.data == other.data
+        return self._data == other._data
 
     def __repr__(self):
-        return '<%s: %r>' % (self.__class__.__name__, self.data)
+        return '<%s: %r>' % (self.__class__.__name__, self._data)
 
     @property
     def id(self):
-        return self.data.get('_id')
+        return self._data.get('_id')
 
-    def save(self, safe=True):
+    def get_changes(self):
+        """
+        Returns ``(set_data, unset_data)`` pair describing changes made to
+        ``data`` since document was fetched or last saved. If that is unknown
+        all keys are returned as changed.
+        """
+        if self._pending_snapshot:
+            return {}, {}
+        data = self._data.copy()
+        data.pop('_id', None)
+        if self._saved_data is None:
+            return data, {}
+        saved_data = self._saved_data.copy()
+        saved_data.pop('_id', None)
+        return get_changes(saved_data, data)
+
+    def get_update(self):
+        """
+        Returns update document (``$set``/``$unset``) with keys changed since
+        the document was saved or fetched, or ``None`` if nothing changed.
+        """
+        set_data, unset_data = self.get_changes()
+        if not (set_data or unset_data):
+            return None
+        update = {}
+        if set_data:
+            update['$set'] = set_data
+        if unset_data:
+            update['$unset'] = unset_data
+        return update
+
+    def save(self, safe=True, write_concern=None):
+        """
+        Saves document (only changed keys of already saved one).
+
+        :param write_concern: overrides document's ``Meta.write_concern``
+        """
+        options = self.objects.get_write_options(safe, write_concern)
         if not self.id:
             self.data[u'_id'] = self.objects.collection.insert(self.data,
-                safe=safe)
+                **options)
         else:
-            update_data = self.data.copy()
-            del update_data['_id']
-            self.objects.collection.update({'_id': self.id},
-                {'$set': update_data}, safe=safe)
+            update = self.get_update()
+            if update is None:
+                return self
+            self.objects.collection.update({'_id': self.id}, update,
+                **options)
+        self._saved()
+        return self
+
+    def asave(self, safe=True, write_concern=None):
+        """
+        Non-blocking ``save``; returns future (see ``djmongo.nonblocking``).
+        """
+        return self.__class__.aobjects.asave(self, safe, write_concern)
+
+    def delete(self, safe=True, write_concern=None):
+        """
+        Removes document from the database. Document may be saved again (as
+        a new one) afterwards.
+        """
+        if self.id is None:
+            raise DjongoError("%s can't be deleted, as it's not saved" %
+                self.__class__.__name__)
+        result = self.objects.collection.remove({'_id': self.id},
+            **self.objects.get_write_options(safe, write_concern))
+        self._deleted()
+        return result
+
+    def adelete(self, safe=True, write_concern=None):
+        """
+        Non-blocking ``delete``; returns future (see ``djmongo.nonblocking``).
+        """
+        return self.__class__.aobjects.adelete(self, safe, write_concern)
+
+    def _saved(self):
+        """
+        Called after document was written to the database (by ``save`` or
+        non-blocking API). Invalidates cached query results and keeps
+        document in the identity map.
+        """
+        self._snapshot()
+        invalidate(self.__class__)
+        identities = get_identity_map()
+        if identities is not None:
+            identities.add(self)
+
+    def _deleted(self):
+        """
+        Called after document was removed from the database.
+        """
+        invalidate(self.__class__)
+        identities = get_identity_map()
+        if identities is not None:
+            identities.remove(self)
+        del self.data['_id']
+        self._saved_data = None
+
+    def reload(self):
+        """
+        Replaces ``data`` with the one currently stored in the database.
+        """
+        data = self.objects.collection.find_one({'_id': self.id})
+        if data is None:
+            raise self.DoesNotExist("No item found with _id: %r" % self.id)
+        self._data = data
+        self._pending_snapshot = True
         return self
 
     @property
@@ -5,3 +5,17 @@ class DjongoError(Exception):
 class MultipleItemsReturnedError(DjongoError):
     pass
 
+
+class BulkCreateError(DjongoError):
+    """
+    Raised by ``Manager.bulk_create`` if any of the batches failed. Each item
+    of ``errors`` is a ``(documents, error)`` pair for a single batch, where
+    ``documents`` are the ones of the batch which were not inserted (other
+    documents of the batch have ``_id`` set, just like successful ones).
+    """
+
+    def __init__(self, errors, documents):
+        self.errors = errors
+        self.documents = documents
+        super(BulkCreateError, self).__init__("%d batch(es) failed to insert"
+            % len(errors))
@@ -0,0 +1,130 @@
+"""
+Helpers for inspecting query plans. ``QuerySet.explain`` returns plans
+normalized by ``normalize_explain``, so the same keys are available for all
+server versions.
+
+If ``MONGODB_SLOW_QUERY_MS`` setting is given, each query which took at
+least that many milliseconds is explained, and ``SlowQueryWarning`` is
+issued if it scanned whole collection or sorted documents in memory. The
+warning suggests an index for the document. This is meant for development
+only, as each slow query is executed again.
+"""
+import warnings
+from django.conf import settings
+import pymongo
+
+
+# operators which don't select a single value of the field
+RANGE_OPERATORS = ('$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$regex',
+    '$exists', '$not', '$elemMatch', '$all', '$size')
+
+
+class SlowQueryWarning(RuntimeWarning):
+    pass
+
+
+def get_stages(plan):
+    """
+    Returns list of names of all stages of the query ``plan`` (starting with
+    the top one).
+    """
+    stages = []
+    plans = [plan]
+    while plans:
+        plan = plans.pop(0)
+        stages.append(plan.get('stage'))
+        if 'inputStage' in plan:
+            plans.append(plan['inputStage'])
+        plans.extend(plan.get('inputStages', []))
+    return stages
+
+
+def normalize_explain(raw):
+    """
+    Returns dictionary with ``winning_plan``, ``stages``, ``keys_examined``,
+    ``docs_examined``, ``returned`` and ``time`` (milliseconds) for the
+    ``raw`` output of ``explain``. Plans of servers older than 3.0 are
+    translated into the ``COLLSCAN``/``IXSCAN``/``SORT`` stages.
+    """
+    if 'queryPlanner' in raw:
+        plan = raw['queryPlanner']['winningPlan']
+        stats = raw.get('executionStats', {})
+        keys_examined = stats.get('totalKeysExamined')
+        docs_examined = stats.get('totalDocsExamined')
+        returned = stats.get('nReturned')
+        time = stats.get('executionTimeMillis')
+    else:
+        cursor = raw.get('cursor', '')
+        if cursor == 'BasicCursor':
+            plan = {'stage': 'COLLSCAN'}
+            keys_examined = 0
+        else:
+            plan = {'stage': 'IXSCAN', 'indexName': cursor.partition(' ')[2]}
+            keys_examined = raw.get('nscanned')
+        if raw.get('scanAndOrder'):
+            plan = {'stage': 'SORT', 'inputStage': plan}
+        docs_examined = raw.get('nscannedObjects')
+        returned = raw.get('n')
+        time = raw.get('millis')
+    return {
+        'winning_plan': plan,
+        'stages': get_stages(plan),
+        'keys_examined': keys_examined,
+        'docs_examined': docs_examined,
+        'returned': returned,
+        'time': time,
+        'raw': raw,
+    }
+
+
+def suggest_index(spec, ordering=None):
+    """
+    Returns ``Index`` which supports query with given ``spec`` and
+    ``ordering`` (list of ``(key, direction)`` pairs). Fields matched by
+    equality come first, then sort fields and fields matched by range.
+    """
+    from djmongo.document import Index
+    equality, ranges = [], []
+    for key, value in (spec or {}).items():
+        if key.startswith('$'):
+            continue
+        if isinstance(value, dict) and any(operator in RANGE_OPERATORS
+                for operator in value):
+            ranges.append(key)
+        elif hasattr(value, 'pattern'):
+            ranges.append(key)
+        else:
+            equality.append(key)
+    keys = [(key, pymongo.ASCENDING) for key in sorted(equality)]
+    for key, direction in ordering or []:
+        if key not in equality:
+            keys.append((key, direction))
+    used = [key for key, direction in keys]
+    keys += [(key, pymongo.ASCENDING) for key in sorted(ranges)
+        if key not in used]
+    return Index(keys)
+
+
+def get_slow_query_threshold():
+    return getattr(settings, 'MONGODB_SLOW_QUERY_MS', None)
+
+
+def check_slow_query(document, cursor, spec, ordering, duration):
+    """
+    Explains query run by ``cursor`` if it took at least
+    ``MONGODB_SLOW_QUERY_MS`` and warns if it didn't use an index (for
+    filtering or sorting).
+    """
+    threshold = get_slow_query_threshold()
+    if threshold is None or duration * 1000 < threshold:
+        return
+    info = normalize_explain(cursor.explain())
+    problems = [stage for stage in ('COLLSCAN', 'SORT')
+        if stage in info['stages']]
+    if not problems:
+        return
+    index = suggest_index(spec, ordering)
+    warnings.warn("Slow query (%dms) %r on %s uses %s; consider adding "
+        "Index(%r) to %s.Meta.indexes" % (duration * 1000, spec,
+        document._meta.collection_name, ', '.join(problems), list(index.keys),
+        document.__name__), SlowQueryWarning)
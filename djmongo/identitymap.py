@@ -0,0 +1,79 @@
+"""
+Per-request identity map. While it's active, ``Manager.get(_id=...)`` and
+``Manager.in_bulk`` return the same ``Document`` instance for the same
+``_id`` and fetch each document at most once::
+
+    with identity_map():
+        item = Item.objects.get(_id=item_id)
+        assert Item.objects.get(_id=item_id) is item
+
+For views ``djmongo.middleware.IdentityMapMiddleware`` activates it for each
+request. Maps are local to the thread.
+"""
+import threading
+
+
+_local = threading.local()
+
+
+class IdentityMap(object):
+    """
+    Documents keyed by ``(collection name, _id)``.
+    """
+
+    def __init__(self):
+        self.documents = {}
+
+    def get(self, document_class, _id):
+        document = self.documents.get((document_class._meta.collection_name,
+            _id))
+        if isinstance(document, document_class):
+            return document
+        return None
+
+    def add(self, document):
+        if document.id is not None:
+            self.documents[(document._meta.collection_name, document.id)] = (
+                document)
+
+    def remove(self, document):
+        self.documents.pop((document._meta.collection_name, document.id),
+            None)
+
+    def clear(self, collection_name=None):
+        """
+        Forgets documents of given collection (or all of them).
+        """
+        if collection_name is None:
+            self.documents.clear()
+            return
+        for key in self.documents.keys():
+            if key[0] == collection_name:
+                del self.documents[key]
+
+
+def get_identity_map():
+    """
+    Returns identity map active in the current thread or ``None``.
+    """
+    maps = getattr(_local, 'maps', None)
+    if maps:
+        return maps[-1]
+    return None
+
+
+class identity_map(object):
+    """
+    Context manager which activates new identity map (in the current
+    thread) and returns it. Maps may be nested.
+    """
+
+    def __enter__(self):
+        self.map = IdentityMap()
+        if not hasattr(_local, 'maps'):
+            _local.maps = []
+        _local.maps.append(self.map)
+        return self.map
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.maps.remove(self.map)
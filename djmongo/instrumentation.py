@@ -0,0 +1,287 @@
+"""
+Instrumentation of collection operations. Managers return collections
+wrapped by ``InstrumentedCollection`` if queries are logged (``DEBUG`` is
+on) or there is a receiver of ``djmongo.signals.query_executed`` connected::
+
+    def log_slow_queries(sender, operation, duration, **kwargs):
+        if duration > 0.5:
+            logger.warning("Slow %s on %s", operation, kwargs['collection'])
+
+    query_executed.connect(log_slow_queries)
+
+Logged queries are appended to ``connection.queries``, just like the ones
+of SQL backends. Collections are also instrumented if slow queries should be
+detected (see ``djmongo.explain``).
+
+Size of sent and fetched documents (``bytes``) is computed only if queries
+are logged or ``MONGODB_INSTRUMENT_BYTES`` setting is ``True``, as each
+document has to be encoded again; otherwise it's ``None``.
+"""
+import logging
+from bson import BSON
+from django.conf import settings
+from djmongo.explain import check_slow_query
+from djmongo.explain import get_slow_query_threshold
+from djmongo.signals import query_executed
+from time import time
+import pymongo
+
+
+logger = logging.getLogger('djmongo.queries')
+
+
+def logs_queries(connection):
+    return (connection.use_debug_cursor or
+        (connection.use_debug_cursor is None and settings.DEBUG))
+
+
+def is_enabled(connection):
+    """
+    Returns ``True`` if operations made by ``connection`` should be
+    instrumented.
+    """
+    return (logs_queries(connection) or bool(query_executed.receivers) or
+        get_slow_query_threshold() is not None)
+
+
+def get_shape(spec):
+    """
+    Returns ``spec`` (filter) with all values replaced by ``'?'``, so that
+    queries differing only by values have the same shape.
+    """
+    if isinstance(spec, dict):
+        return dict((key, get_shape(value)) for key, value in spec.items())
+    if (isinstance(spec, (list, tuple)) and spec and
+        all(isinstance(value, dict) for value in spec)):
+        return [get_shape(value) for value in spec]
+    return '?'
+
+
+def counts_bytes(connection):
+    return (logs_queries(connection) or
+        getattr(settings, 'MONGODB_INSTRUMENT_BYTES', False))
+
+
+def get_size(data):
+    return len(BSON.encode(data))
+
+
+class InstrumentedCollection(object):
+    """
+    Proxy of pymongo's collection which records operations made with it.
+    """
+
+    def __init__(self, collection, document, connection):
+        self.collection = collection
+        self.document = document
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def __repr__(self):
+        return '<InstrumentedCollection: %s>' % self.collection.name
+
+    def get_size(self, *documents):
+        """
+        Returns total size of ``documents`` or ``None`` if it's not computed.
+        """
+        if not counts_bytes(self.connection):
+            return None
+        return sum(get_size(document) for document in documents)
+
+    def record(self, operation, spec, duration, documents=0, size=None):
+        if logs_queries(self.connection):
+            sql = '%s.%s(%r)' % (self.collection.name, operation, spec)
+            self.connection.queries.append({
+                'sql': sql,
+                'time': '%.3f' % duration,
+                'operation': operation,
+                'collection': self.collection.name,
+                'documents': documents,
+                'bytes': size,
+            })
+            logger.debug('(%.3f) %s' % (duration, sql), extra={
+                'duration': duration, 'sql': sql})
+        query_executed.send(sender=self.document, using=self.connection.alias,
+            operation=operation, collection=self.collection.name,
+            filter=get_shape(spec), duration=duration, documents=documents,
+            bytes=size)
+
+    def call(self, operation, *args, **kwargs):
+        start = time()
+        result = getattr(self.collection, operation)(*args, **kwargs)
+        return result, time() - start
+
+    def find(self, spec=None, *args, **kwargs):
+        cursor = self.collection.find(spec, *args, **kwargs)
+        return InstrumentedCursor(self, cursor, 'find', spec)
+
+    def find_one(self, spec=None, *args, **kwargs):
+        result, duration = self.call('find_one', spec, *args, **kwargs)
+        if result is None:
+            self.record('find_one', spec, duration)
+        else:
+            self.record('find_one', spec, duration, 1, self.get_size(result))
+        return result
+
+    def insert(self, doc_or_docs, *args, **kwargs):
+        result, duration = self.call('insert', doc_or_docs, *args,
+            **kwargs)
+        docs = doc_or_docs
+        if isinstance(docs, dict):
+            docs = [docs]
+        self.record('insert', None, duration, len(docs),
+            self.get_size(*docs))
+        return result
+
+    def update(self, spec, document, *args, **kwargs):
+        result, duration = self.call('update', spec, document, *args,
+            **kwargs)
+        self.record('update', spec, duration, (result or {}).get('n', 0),
+            self.get_size(document))
+        return result
+
+    def remove(self, spec_or_id=None, *args, **kwargs):
+        result, duration = self.call('remove', spec_or_id, *args,
+            **kwargs)
+        self.record('remove', spec_or_id, duration,
+            (result or {}).get('n', 0))
+        return result
+
+    def find_and_modify(self, query={}, *args, **kwargs):
+        result, duration = self.call('find_and_modify', query, *args,
+            **kwargs)
+        value = result
+        if kwargs.get('full_response'):
+            value = result.get('value')
+        if value:
+            self.record('find_and_modify', query, duration, 1,
+                self.get_size(value))
+        else:
+            self.record('find_and_modify', query, duration)
+        return result
+
+    def aggregate(self, pipeline, **kwargs):
+        result, duration = self.call('aggregate', pipeline, **kwargs)
+        if isinstance(result, dict):
+            # result of pymongo < 3 without cursor option
+            self.record('aggregate', pipeline, duration,
+                len(result.get('result', [])), self.get_size(result))
+            return result
+        return InstrumentedCursor(self, result, 'aggregate', pipeline,
+            duration)
+
+
+class InstrumentedCursor(object):
+    """
+    Proxy of pymongo's cursor which records iteration over it - time spent
+    on fetching documents, number of documents and their size - as a single
+    operation. It's recorded when the cursor is exhausted, fails or is
+    closed; iteration abandoned without closing the cursor is recorded when
+    the cursor is released.
+    """
+
+    def __init__(self, collection, cursor, operation, spec, duration=0.0):
+        self.started = False
+        self.recorded = False
+        self.collection = collection
+        self.cursor = cursor
+        self.operation = operation
+        self.spec = spec
+        self.duration = duration
+        self.ordering = []
+        self.documents = 0
+        self.size = None
+        if counts_bytes(collection.connection):
+            self.size = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.cursor, name)
+        if not callable(attr):
+            return attr
+        def method(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # keep chained calls (i.e. ``sort``, ``limit``) instrumented
+            if result is self.cursor:
+                return self
+            return result
+        return method
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if not self.started:
+            self.started = True
+            self.iterator = iter(self.cursor)
+        start = time()
+        try:
+            item = self.iterator.next()
+        except StopIteration:
+            self.duration += time() - start
+            self.finish(exhausted=True)
+            raise
+        except Exception:
+            self.duration += time() - start
+            self.finish()
+            raise
+        self.duration += time() - start
+        self.documents += 1
+        if self.size is not None:
+            self.size += get_size(item)
+        return item
+
+    def __getitem__(self, index):
+        if not isinstance(index, (int, long)):
+            self.cursor[index]
+            return self
+        start = time()
+        item = self.cursor[index]
+        self.collection.record(self.operation, self.spec, time() - start, 1,
+            self.collection.get_size(item))
+        return item
+
+    def close(self):
+        self.cursor.close()
+        self.finish()
+
+    def __del__(self):
+        self.finish()
+
+    def finish(self, exhausted=False):
+        """
+        Records the iteration, if it was started and not recorded yet. Slow
+        queries are explained only if the cursor was ``exhausted``, so that
+        no queries are made while a failure is handled or the cursor is
+        released.
+        """
+        if not self.started or self.recorded:
+            return
+        self.recorded = True
+        self.collection.record(self.operation, self.spec, self.duration,
+            self.documents, self.size)
+        if exhausted and self.operation == 'find':
+            check_slow_query(self.collection.document, self.cursor,
+                self.spec, self.ordering, self.duration)
+
+    def sort(self, key_or_list, direction=None):
+        self.cursor.sort(key_or_list, direction)
+        if isinstance(key_or_list, basestring):
+            self.ordering = [(key_or_list, direction or pymongo.ASCENDING)]
+        else:
+            self.ordering = list(key_or_list)
+        return self
+
+    def count(self, *args, **kwargs):
+        start = time()
+        result = self.cursor.count(*args, **kwargs)
+        self.collection.record('count', self.spec, time() - start)
+        return result
+
+    def distinct(self, key):
+        start = time()
+        result = self.cursor.distinct(key)
+        self.collection.record('distinct', self.spec, time() - start,
+            len(result))
+        return result
@@ -0,0 +1,151 @@
+"""
+Compiles Django-like lookups into mongodb query documents. Example::
+
+    compile_filters({'age__gte': 18, 'age__lt': 65, 'author__name': 'Joe'})
+
+would return ``{'age': {'$gte': 18, '$lt': 65}, 'author.name': 'Joe'}``.
+
+Lookup key is a field path (parts separated with ``__``) optionally followed
+by one of ``OPERATORS``. Lookups for the same field are merged into a single
+predicate.
+"""
+import re
+
+
+def _list(value):
+    return list(value)
+
+
+def _elem_match(value):
+    if isinstance(value, dict):
+        return compile_filters(value)
+    return value
+
+
+def _contains_regex(flags=0):
+    def compile_regex(value):
+        return re.compile(re.escape(value), flags)
+    return compile_regex
+
+
+def _prefix_regex(flags=0):
+    def compile_regex(value):
+        return re.compile('^' + re.escape(value), flags)
+    return compile_regex
+
+
+# lookup name -> (mongodb operator, value converter)
+OPERATORS = {
+    'ne': ('$ne', None),
+    'gt': ('$gt', None),
+    'gte': ('$gte', None),
+    'lt': ('$lt', None),
+    'lte': ('$lte', None),
+    'in': ('$in', _list),
+    'nin': ('$nin', _list),
+    'all': ('$all', _list),
+    'size': ('$size', int),
+    'exists': ('$exists', bool),
+    'elem_match': ('$elemMatch', _elem_match),
+    'contains': ('$regex', _contains_regex()),
+    'icontains': ('$regex', _contains_regex(re.IGNORECASE)),
+    # anchored, case sensitive prefix may be answered using an index
+    'startswith': ('$regex', _prefix_regex()),
+    'istartswith': ('$regex', _prefix_regex(re.IGNORECASE)),
+}
+
+EXACT = 'exact'
+
+MAX_CACHED_PLANS = 1000
+
+_plans = {}
+
+
+def parse_lookup(key):
+    """
+    Returns ``(path, lookup)`` pair for given filter ``key``, i.e.
+    ``('author.age', 'gte')`` for ``author__age__gte``.
+    """
+    parts = key.split('__')
+    lookup = EXACT
+    if len(parts) > 1 and (parts[-1] in OPERATORS or parts[-1] == EXACT):
+        lookup = parts.pop()
+    return '.'.join(parts), lookup
+
+
+def get_plan(keys):
+    """
+    Returns compiled plan - list of ``(key, path, lookup)`` tuples - for the
+    filters with given ``keys``. Plans are cached by the shape of filters
+    (sorted keys).
+    """
+    shape = tuple(sorted(keys))
+    plan = _plans.get(shape)
+    if plan is None:
+        if len(_plans) >= MAX_CACHED_PLANS:
+            _plans.clear()
+        plan = _plans[shape] = [(key,) + parse_lookup(key) for key in shape]
+    return plan
+
+
+def compile_filters(filters):
+    """
+    Returns mongodb query document for given Django-like ``filters``.
+
+    :raises ValueError: if lookups for the same field can't be merged
+    """
+    query = {}
+    conditions = {}
+    for key, path, lookup in get_plan(filters):
+        value = filters[key]
+        if lookup == EXACT:
+            if path in query or path in conditions:
+                raise ValueError("Cannot combine exact match with other "
+                    "lookups for %r" % path)
+            query[path] = value
+            continue
+        if path in query:
+            raise ValueError("Cannot combine exact match with other "
+                "lookups for %r" % path)
+        operator, convert = OPERATORS[lookup]
+        condition = conditions.setdefault(path, {})
+        if operator in condition:
+            raise ValueError("Conflicting %r lookups for %r" % (operator,
+                path))
+        condition[operator] = convert(value) if convert else value
+    query.update(conditions)
+    return query
+
+
+# update operator prefix -> mongodb update operator
+UPDATE_OPERATORS = {
+    'set': '$set',
+    'unset': '$unset',
+    'inc': '$inc',
+    'push': '$push',
+    'pull': '$pull',
+    'add_to_set': '$addToSet',
+    'min': '$min',
+    'max': '$max',
+}
+
+
+def compile_update(data):
+    """
+    Returns mongodb update document for Django-like ``data``. Keys may be
+    prefixed with one of ``UPDATE_OPERATORS`` (i.e. ``inc__stats__views=1``
+    becomes ``{'$inc': {'stats.views': 1}}``); other keys are ``$set`` as
+    they are.
+    """
+    update = {}
+    for key, value in data.items():
+        operator, path = '$set', key
+        prefix, separator, rest = key.partition('__')
+        if separator and prefix in UPDATE_OPERATORS:
+            operator = UPDATE_OPERATORS[prefix]
+            path = rest.replace('__', '.')
+        if operator == '$unset':
+            value = 1
+        update.setdefault(operator, {})[path] = value
+    return update
+
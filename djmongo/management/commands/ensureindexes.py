@@ -0,0 +1,25 @@
+from django.core.management.base import NoArgsCommand
+from djmongo.document import ensure_all_indexes
+from optparse import make_option
+
+
+class Command(NoArgsCommand):
+    help = "Creates missing indexes declared at documents' Meta.indexes."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=None, help='Only ensure indexes of documents stored at '
+                'given database.'),
+        make_option('--foreground', action='store_false', dest='background',
+            default=True, help='Build indexes in the foreground.'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        result = ensure_all_indexes(using=options.get('database'),
+            background=options.get('background', True), force=True)
+        for document, indexes in result.items():
+            for index in indexes:
+                if verbosity >= 1:
+                    self.stdout.write("Created %r for %s\n" % (index,
+                        document._meta.collection_name))
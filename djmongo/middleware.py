@@ -0,0 +1,25 @@
+from djmongo.identitymap import identity_map
+
+
+class IdentityMapMiddleware(object):
+    """
+    Activates identity map for each request, so documents fetched by ``_id``
+    are loaded at most once per request.
+    """
+
+    def process_request(self, request):
+        request._djmongo_identity_map = identity_map()
+        request._djmongo_identity_map.__enter__()
+
+    def process_response(self, request, response):
+        self.deactivate(request)
+        return response
+
+    def process_exception(self, request, exception):
+        self.deactivate(request)
+
+    def deactivate(self, request):
+        context = getattr(request, '_djmongo_identity_map', None)
+        if context is not None:
+            context.__exit__(None, None, None)
+            del request._djmongo_identity_map
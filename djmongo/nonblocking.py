@@ -0,0 +1,491 @@
+"""
+Non-blocking API built on Motor_ and Tornado_ (both have to be installed).
+Methods prefixed with ``a`` return futures which may be yielded from
+``tornado.gen.coroutine`` functions. Documents expose ``AsyncManager`` as
+``aobjects``::
+
+    @gen.coroutine
+    def handle():
+        item = yield Item.aobjects.aget(slug='slayer')
+        count = yield Item.aobjects.filter(status='new').acount()
+        item.data['views'] += 1
+        yield item.asave()
+
+``AsyncQuerySet`` compiles filters, ordering and projection just like
+``QuerySet``. To stream results use Motor's cursor::
+
+    cursor = Item.aobjects.filter(status='new').get_items()
+    while (yield cursor.fetch_next):
+        item = Item.from_db(cursor.next_object())
+
+Methods which would block (``count``, ``get``, ``update``...) raise
+``TypeError`` pointing to their non-blocking counterparts.
+
+Motor's client is made from the settings of document's database
+(``HOST``, ``PORT``, ``OPTIONS``...); collection gets document's
+``Meta.read_preference``. Operations are instrumented (as blocking ones,
+see ``djmongo.instrumentation``) when their futures are resolved; results
+streamed with ``fetch_next`` are not recorded. ``InProcessCollection`` may
+be passed instead of Motor's collection, i.e. in tests.
+
+.. _Motor: https://github.com/mongodb/motor
+.. _Tornado: http://www.tornadoweb.org
+"""
+import os
+import sys
+import pymongo
+from django.core.exceptions import ImproperlyConfigured
+from djmongo import instrumentation
+from djmongo.exceptions import BulkCreateError
+from djmongo.exceptions import DjongoError
+from djmongo.exceptions import MultipleItemsReturnedError
+from djmongo.lookups import compile_update
+from djmongo.querysets import QuerySet
+from djmongo.utils import get_read_preference
+from time import time
+from tornado import gen
+from tornado.concurrent import Future
+
+
+# default max message size of the server
+MAX_MESSAGE_SIZE = 48000000
+
+_clients = {}
+
+
+def get_client(connection):
+    """
+    Returns Motor's client for given database ``connection`` (wrapper).
+    Clients are shared within a process.
+    """
+    try:
+        import motor
+    except ImportError:
+        raise ImproperlyConfigured("Motor is required for non-blocking API")
+    uri = connection.get_connection_uri()
+    options = connection.get_connection_options()
+    key = (os.getpid(), uri, repr(sorted(options.items())))
+    if key not in _clients:
+        _clients[key] = motor.MotorClient(uri, **options)
+    return _clients[key]
+
+
+def get_collection(document):
+    """
+    Returns Motor's collection of given ``document`` class, instrumented the
+    same way as the blocking one.
+    """
+    connection = document._default_manager.connection
+    client = get_client(connection)
+    database = client[connection.settings_dict['NAME']]
+    collection = database[document._meta.collection_name]
+    read_preference = document._meta.read_preference
+    if read_preference is not None:
+        collection.read_preference = get_read_preference(read_preference)
+    if instrumentation.is_enabled(connection):
+        collection = InstrumentedAsyncCollection(collection, document,
+            connection)
+    return collection
+
+
+def _resolved(func, *args, **kwargs):
+    future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception:
+        future.set_exc_info(sys.exc_info())
+    return future
+
+
+class InProcessCursor(object):
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        attr = getattr(self.cursor, name)
+        def method(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self.cursor:
+                return self
+            return result
+        return method
+
+    def to_list(self, length=None):
+        return _resolved(list, self.cursor)
+
+    def count(self, *args, **kwargs):
+        return _resolved(self.cursor.count, *args, **kwargs)
+
+
+class InProcessCollection(object):
+    """
+    Collection with Motor's interface which runs operations with given
+    (blocking) ``collection`` and returns resolved futures.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return InProcessCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if not callable(attr):
+            return attr
+        def method(*args, **kwargs):
+            return _resolved(attr, *args, **kwargs)
+        return method
+
+
+class InstrumentedAsyncCollection(object):
+    """
+    Proxy of Motor's collection which records operations (just like
+    ``InstrumentedCollection``) once their futures are resolved.
+    """
+
+    def __init__(self, collection, document, connection):
+        self.collection = collection
+        self.recorder = instrumentation.InstrumentedCollection(collection,
+            document, connection)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def track(self, future, start, operation, spec, measure):
+        """
+        Records ``operation`` started at ``start`` when its ``future`` is
+        resolved. ``measure`` returns number of documents and their size
+        from the result.
+        """
+        def record(future):
+            if future.exception() is not None:
+                return
+            documents, size = measure(future.result())
+            self.recorder.record(operation, spec, time() - start, documents,
+                size)
+        future.add_done_callback(record)
+        return future
+
+    def call(self, operation, spec, measure, *args, **kwargs):
+        start = time()
+        future = getattr(self.collection, operation)(*args, **kwargs)
+        return self.track(future, start, operation, spec, measure)
+
+    def find(self, spec=None, *args, **kwargs):
+        cursor = self.collection.find(spec, *args, **kwargs)
+        return InstrumentedAsyncCursor(self, cursor, spec)
+
+    def find_one(self, spec=None, *args, **kwargs):
+        def measure(result):
+            if result is None:
+                return 0, None
+            return 1, self.recorder.get_size(result)
+        return self.call('find_one', spec, measure, spec, *args, **kwargs)
+
+    def insert(self, doc_or_docs, *args, **kwargs):
+        docs = doc_or_docs
+        if isinstance(docs, dict):
+            docs = [docs]
+        def measure(result):
+            return len(docs), self.recorder.get_size(*docs)
+        return self.call('insert', None, measure, doc_or_docs, *args,
+            **kwargs)
+
+    def update(self, spec, document, *args, **kwargs):
+        def measure(result):
+            return (result or {}).get('n', 0), self.recorder.get_size(
+                document)
+        return self.call('update', spec, measure, spec, document, *args,
+            **kwargs)
+
+    def remove(self, spec_or_id=None, *args, **kwargs):
+        def measure(result):
+            return (result or {}).get('n', 0), None
+        return self.call('remove', spec_or_id, measure, spec_or_id, *args,
+            **kwargs)
+
+
+class InstrumentedAsyncCursor(object):
+    """
+    Proxy of Motor's cursor which records ``to_list`` and ``count``.
+    """
+
+    def __init__(self, collection, cursor, spec):
+        self.collection = collection
+        self.cursor = cursor
+        self.spec = spec
+
+    def __getattr__(self, name):
+        attr = getattr(self.cursor, name)
+        if not callable(attr):
+            return attr
+        def method(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # keep chained calls (i.e. ``sort``, ``limit``) instrumented
+            if result is self.cursor:
+                return self
+            return result
+        return method
+
+    def to_list(self, length=None):
+        recorder = self.collection.recorder
+        def measure(result):
+            return len(result), recorder.get_size(*result)
+        start = time()
+        future = self.cursor.to_list(length=length)
+        return self.collection.track(future, start, 'find', self.spec,
+            measure)
+
+    def count(self, *args, **kwargs):
+        start = time()
+        future = self.cursor.count(*args, **kwargs)
+        return self.collection.track(future, start, 'count', self.spec,
+            lambda result: (0, None))
+
+
+def _blocking(name, counterpart=None):
+    """
+    Returns method of ``AsyncQuerySet`` which raises ``TypeError``, as
+    inherited ``name`` method would block.
+    """
+    def method(self, *args, **kwargs):
+        if counterpart is None:
+            raise TypeError("AsyncQuerySet doesn't support %s(), as it "
+                "would block" % name)
+        raise TypeError("AsyncQuerySet.%s() would block; use %s() instead"
+            % (name, counterpart))
+    method.__name__ = name
+    return method
+
+
+class AsyncQuerySet(QuerySet):
+    """
+    Queryset which fetches documents without blocking. Only documents are
+    yielded (``values`` and ``annotate`` are not supported).
+    """
+
+    def __init__(self, document, filters=None, ordering=None,
+                 collection=None):
+        super(AsyncQuerySet, self).__init__(document, filters, ordering)
+        self.async_collection = collection
+
+    def __iter__(self):
+        raise TypeError("AsyncQuerySet can't be iterated; use ato_list() or "
+            "cursor returned by get_items()")
+
+    __len__ = _blocking('__len__', 'acount')
+    __nonzero__ = _blocking('__nonzero__', 'aexists')
+    count = _blocking('count', 'acount')
+    get = _blocking('get', 'aget')
+    get_or_none = _blocking('get_or_none', 'aget')
+    first = _blocking('first', 'afirst')
+    last = _blocking('last', 'alast')
+    exists = _blocking('exists', 'aexists')
+    update = _blocking('update', 'aupdate')
+    update_raw = _blocking('update_raw', 'aupdate')
+    delete = _blocking('delete', 'adelete')
+    iterator = _blocking('iterator', 'ato_list')
+    pluck = _blocking('pluck', 'ato_list')
+    paginate_by_key = _blocking('paginate_by_key')
+    aggregate = _blocking('aggregate')
+    distinct = _blocking('distinct')
+    explain = _blocking('explain')
+    parallel_iter = _blocking('parallel_iter')
+    parallel_map = _blocking('parallel_map')
+
+    @property
+    def collection(self):
+        if self.async_collection is None:
+            return get_collection(self.document)
+        return self.async_collection
+
+    def clone(self):
+        queryset = super(AsyncQuerySet, self).clone()
+        queryset.async_collection = self.async_collection
+        return queryset
+
+    @gen.coroutine
+    def ato_list(self):
+        items = yield self.get_items().to_list(length=None)
+        raise gen.Return([self.document.from_db(item) for item in items])
+
+    @gen.coroutine
+    def acount(self):
+        count = yield self.get_items().count()
+        raise gen.Return(count)
+
+    @gen.coroutine
+    def aget(self, **filters):
+        queryset = self.filter(**filters)
+        queryset._ordering = []
+        if queryset.limit is None or queryset.limit > 2:
+            queryset.limit = 2
+        items = yield queryset.ato_list()
+        if len(items) > 1:
+            raise MultipleItemsReturnedError("More than one item found "
+                "for filters: %r" % filters)
+        if not items:
+            raise self.document.DoesNotExist("No item found for filters: %r"
+                % filters)
+        raise gen.Return(items[0])
+
+    @gen.coroutine
+    def afirst(self):
+        queryset = self.clone()
+        if not queryset._ordering:
+            queryset._ordering = ['_id']
+        queryset.limit = 1
+        items = yield queryset.ato_list()
+        raise gen.Return(items[0] if items else None)
+
+    @gen.coroutine
+    def alast(self):
+        if self.offset is not None or self.limit is not None:
+            items = yield self.ato_list()
+            raise gen.Return(items[-1] if items else None)
+        queryset = self.clone()
+        queryset._ordering = self.get_reversed_ordering()
+        item = yield queryset.afirst()
+        raise gen.Return(item)
+
+    @gen.coroutine
+    def aexists(self):
+        queryset = self.clone()
+        queryset._ordering = []
+        items = yield queryset.get_items(fields={'_id': True}).limit(
+            1).to_list(length=1)
+        raise gen.Return(bool(items))
+
+    @gen.coroutine
+    def aupdate(self, safe=True, upsert=False, write_concern=None, **data):
+        if self.offset is not None or self.limit is not None:
+            raise TypeError("Cannot update items of a sliced queryset")
+        result = yield self.collection.update(self.get_filters(),
+            compile_update(data), upsert=upsert, multi=True,
+            **self.get_write_options(safe, write_concern))
+        self.document._default_manager._collection_changed()
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def adelete(self, safe=True, write_concern=None):
+        if self.offset is not None or self.limit is not None:
+            raise TypeError("Cannot delete items of a sliced queryset")
+        result = yield self.collection.remove(self.get_filters(),
+            **self.get_write_options(safe, write_concern))
+        self.document._default_manager._collection_changed()
+        raise gen.Return(result)
+
+
+class AsyncManager(object):
+    """
+    Non-blocking counterpart of document's ``Manager``.
+
+    :param collection: Motor's (or ``InProcessCollection``) collection used
+      instead of the one made from database settings
+    """
+
+    def __init__(self, document, collection=None):
+        self.document = document
+        self.async_collection = collection
+
+    @property
+    def collection(self):
+        if self.async_collection is None:
+            return get_collection(self.document)
+        return self.async_collection
+
+    def get_query_set(self):
+        return AsyncQuerySet(self.document, collection=self.async_collection)
+
+    def all(self):
+        return self.get_query_set()
+
+    def filter(self, **filters):
+        return self.get_query_set().filter(**filters)
+
+    def aget(self, **filters):
+        return self.get_query_set().aget(**filters)
+
+    def acount(self, **filters):
+        return self.filter(**filters).acount()
+
+    def aexists(self, **filters):
+        return self.filter(**filters).aexists()
+
+    @gen.coroutine
+    def acreate(self, write_concern=None, **kwargs):
+        document = self.document(**kwargs)
+        yield self.asave(document, write_concern=write_concern)
+        raise gen.Return(document)
+
+    @gen.coroutine
+    def asave(self, document, safe=True, write_concern=None):
+        """
+        Saves ``document`` just like ``Document.save`` does.
+        """
+        manager = self.document._default_manager
+        options = manager.get_write_options(safe, write_concern)
+        if not document.id:
+            _id = yield self.collection.insert(document.data, **options)
+            document.data[u'_id'] = _id
+        else:
+            update = document.get_update()
+            if update is None:
+                raise gen.Return(document)
+            yield self.collection.update({'_id': document.id}, update,
+                **options)
+        document._saved()
+        raise gen.Return(document)
+
+    @gen.coroutine
+    def adelete(self, document, safe=True, write_concern=None):
+        """
+        Removes ``document`` just like ``Document.delete`` does.
+        """
+        if document.id is None:
+            raise DjongoError("%s can't be deleted, as it's not saved" %
+                self.document.__name__)
+        manager = self.document._default_manager
+        result = yield self.collection.remove({'_id': document.id},
+            **manager.get_write_options(safe, write_concern))
+        document._deleted()
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def abulk_create(self, documents, batch_size=None, ordered=False,
+                     safe=True, write_concern=None):
+        """
+        Same as ``Manager.bulk_create`` but batches are inserted without
+        blocking.
+        """
+        manager = self.document._default_manager
+        documents = list(documents)
+        options = manager.get_write_options(safe, write_concern)
+        errors = []
+        batches = manager._get_insert_batches(documents, batch_size,
+            max_size=MAX_MESSAGE_SIZE)
+        for batch in batches:
+            preset_ids = [document.id is not None for document in batch]
+            try:
+                ids = yield self.collection.insert([document.data
+                    for document in batch], continue_on_error=not ordered,
+                    **options)
+            except pymongo.errors.OperationFailure, err:
+                stored = yield self.collection.find({'_id': {'$in': [
+                    document.id for document in batch
+                    if document.id is not None]}},
+                    fields={'_id': True}).to_list(length=None)
+                errors.append((manager._get_failed_documents(batch,
+                    preset_ids, [item['_id'] for item in stored]), err))
+                if ordered:
+                    break
+                continue
+            for document, _id in zip(batch, ids):
+                document.data[u'_id'] = _id
+                document._snapshot()
+        manager._collection_changed()
+        if errors:
+            raise BulkCreateError(errors, documents)
+        raise gen.Return(documents)
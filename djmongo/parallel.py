@@ -0,0 +1,192 @@
+"""
+Helpers for parallel scans (``QuerySet.parallel_iter`` and
+``QuerySet.parallel_map``). Query is split into disjoint ``_id`` ranges,
+which are scanned by worker threads (sharing the pooled connection) or
+processes.
+
+Processes fetch each range in chunks (ordered by ``_id``) and send back
+results of one chunk at a time, so that neither workers nor the parent keep
+a whole range in memory. Pool's initializer resets shared connections of
+each worker, so it connects on its own and never uses sockets or locks
+inherited from the parent (which could be held by another thread of the
+parent at the time of ``fork``).
+"""
+import calendar
+import collections
+import multiprocessing
+import numbers
+import Queue
+import sys
+import threading
+from bson import ObjectId
+from datetime import datetime
+from djmongo.backend.mongodb.base import shared_connections
+
+
+# number of ranges scanned by each worker; more ranges balance the work
+RANGES_PER_WORKER = 4
+
+# number of documents mapped by a worker process at once
+CHUNK_SIZE = 1000
+
+_DONE = object()
+
+
+def get_split_points(lowest, highest, count):
+    """
+    Returns sorted list of at most ``count - 1`` values which split range
+    between ``lowest`` and ``highest`` ``_id`` into parts of similar size.
+    ObjectIds are split by their generation time, numbers by interpolation;
+    other values are not split.
+    """
+    if isinstance(lowest, ObjectId) and isinstance(highest, ObjectId):
+        start = calendar.timegm(lowest.generation_time.utctimetuple())
+        end = calendar.timegm(highest.generation_time.utctimetuple())
+        points = [ObjectId.from_datetime(datetime.utcfromtimestamp(
+            start + (end - start) * part // count))
+            for part in range(1, count)]
+    elif (isinstance(lowest, numbers.Real) and
+          isinstance(highest, numbers.Real) and
+          not isinstance(lowest, bool) and not isinstance(highest, bool)):
+        points = [lowest + (highest - lowest) * part / float(count)
+            for part in range(1, count)]
+        if isinstance(lowest, (int, long)) and isinstance(highest, (int, long)):
+            points = [int(point) for point in points]
+    else:
+        points = []
+    return sorted(set(point for point in points
+        if lowest < point <= highest))
+
+
+def get_ranges(points):
+    """
+    Returns list of ``(lower, upper)`` pairs for given split ``points``;
+    ``lower`` is inclusive, ``upper`` exclusive and ``None`` means the range
+    is not bounded (so ranges cover all values).
+    """
+    bounds = [None] + list(points) + [None]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def get_range_query(query, lower, upper):
+    """
+    Returns ``query`` limited to documents which ``_id`` is within given
+    range.
+    """
+    condition = {}
+    if lower is not None:
+        condition['$gte'] = lower
+    if upper is not None:
+        condition['$lt'] = upper
+    if not condition:
+        return query
+    if '_id' not in query:
+        query = dict(query)
+        query['_id'] = condition
+        return query
+    return {'$and': [query, {'_id': condition}]}
+
+
+def _put(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Queue.Full:
+            pass
+    return False
+
+
+def _scan(tasks, results, stop, func):
+    error = None
+    try:
+        while not stop.is_set():
+            try:
+                queryset = tasks.get_nowait()
+            except Queue.Empty:
+                break
+            for item in queryset.iterator():
+                if func is not None:
+                    item = func(item)
+                if not _put(results, item, stop):
+                    return
+    except Exception:
+        error = sys.exc_info()
+    _put(results, (_DONE, error), stop)
+
+
+def iter_threads(querysets, workers, func=None, queue_size=None):
+    """
+    Scans ``querysets`` using ``workers`` threads and yields their items
+    (or results of ``func`` called with them) as soon as they are fetched.
+    Workers wait if ``queue_size`` items are waiting to be consumed.
+    """
+    tasks = Queue.Queue()
+    for queryset in querysets:
+        tasks.put(queryset)
+    results = Queue.Queue(queue_size or 0)
+    stop = threading.Event()
+    threads = [threading.Thread(target=_scan, args=(tasks, results, stop,
+        func)) for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        running = len(threads)
+        while running:
+            item = results.get()
+            if isinstance(item, tuple) and item and item[0] is _DONE:
+                running -= 1
+                if item[1] is not None:
+                    raise item[1][0], item[1][1], item[1][2]
+                continue
+            yield item
+    finally:
+        stop.set()
+
+
+def _init_worker():
+    shared_connections.reset()
+
+
+def _map_chunk(queryset, func, chunk_size, after):
+    items, next_key = queryset.paginate_by_key(chunk_size, after)
+    return [func(item) for item in items], next_key
+
+
+def iter_processes(querysets, func, workers, chunk_size=None,
+                   pending_per_worker=2):
+    """
+    Maps items of ``querysets`` with ``func`` using pool of ``workers``
+    processes and yields results of each chunk of ``chunk_size`` items (in
+    order the chunks were scheduled). Chunks of each queryset are fetched
+    one after another (ordered by ``_id``); at most ``pending_per_worker``
+    chunks per worker are scheduled at once. Errors (also the ones of
+    pickling ``func`` or its results) are raised by the iterator.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    ready = collections.deque((queryset.order_by('_id'), None)
+        for queryset in querysets)
+    pending = collections.deque()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker)
+    completed = False
+    try:
+        while ready or pending:
+            while ready and len(pending) < workers * pending_per_worker:
+                queryset, after = ready.popleft()
+                pending.append((queryset, pool.apply_async(_map_chunk,
+                    (queryset, func, chunk_size, after))))
+            queryset, result = pending.popleft()
+            chunk, next_key = result.get()
+            if next_key is not None:
+                # finish started ranges first
+                ready.appendleft((queryset, next_key))
+            for item in chunk:
+                yield item
+        completed = True
+    finally:
+        if completed:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
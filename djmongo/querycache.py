@@ -0,0 +1,94 @@
+"""
+Shared cache of query results, used by ``QuerySet.cache``. Results are kept
+at Django's cache given by ``MONGODB_CACHE_ALIAS`` setting (``'default'`` by
+default). Each collection has a generation number which is a part of all
+keys and which is increased after every write made by djmongo, so entries
+cached before a write are never used again.
+
+Cache has to be enabled for the document by ``Meta.query_cache``, so that
+writes to other documents don't make a round trip to the cache.
+"""
+from bson import json_util
+from django.conf import settings
+from hashlib import md5
+from time import time
+import json
+
+
+# generation numbers should outlive cached results
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+_caches = {}
+
+
+def get_query_cache():
+    from django.core.cache import get_cache
+    alias = getattr(settings, 'MONGODB_CACHE_ALIAS', 'default')
+    if alias not in _caches:
+        _caches[alias] = get_cache(alias)
+    return _caches[alias]
+
+
+def get_generation_key(collection_name):
+    return 'djmongo:generation:%s' % md5(collection_name).hexdigest()
+
+
+def get_generation(collection_name):
+    """
+    Returns current generation of the collection.
+    """
+    cache = get_query_cache()
+    key = get_generation_key(collection_name)
+    generation = cache.get(key)
+    if generation is None:
+        # generation starts with a timestamp, so that it never goes back to
+        # a value used before (i.e. if it was evicted)
+        cache.add(key, int(time() * 1000), GENERATION_TIMEOUT)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def bump_generation(collection_name):
+    """
+    Invalidates all results cached for the collection.
+    """
+    cache = get_query_cache()
+    key = get_generation_key(collection_name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time() * 1000), GENERATION_TIMEOUT)
+
+
+def invalidate(document):
+    """
+    Invalidates results cached for the collection of ``document`` class, if
+    it uses the cache.
+    """
+    if document._meta.query_cache:
+        bump_generation(document._meta.collection_name)
+
+
+def _default(value):
+    try:
+        return json_util.default(value)
+    except TypeError:
+        return repr(value)
+
+
+def serialize_query(query):
+    """
+    Returns string representation of ``query`` which doesn't depend on order
+    of dictionary keys or addresses of objects (i.e. compiled regular
+    expressions are given by their pattern and flags).
+    """
+    return json.dumps(query, sort_keys=True, default=_default)
+
+
+def get_cache_key(collection_name, query):
+    """
+    Returns key for results of ``query`` (tuple describing it) run against
+    given collection.
+    """
+    return 'djmongo:query:%s:%s' % (get_generation(collection_name),
+        md5(serialize_query((collection_name, query))).hexdigest())
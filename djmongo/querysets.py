@@ -1,21 +1,56 @@
+from bson.son import SON
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.datastructures import SortedDict
 from djmongo.exceptions import MultipleItemsReturnedError
+from djmongo.explain import normalize_explain
+from djmongo.parallel import RANGES_PER_WORKER
+from djmongo.parallel import get_range_query
+from djmongo.parallel import get_ranges
+from djmongo.parallel import get_split_points
+from djmongo.parallel import iter_processes
+from djmongo.parallel import iter_threads
+from djmongo.querycache import get_cache_key
+from djmongo.querycache import get_query_cache
+from djmongo.lookups import compile_filters
+from djmongo.lookups import compile_update
+from djmongo.utils import get_path
+from djmongo.utils import get_read_preference
 import pymongo
-import re
 
 
 class QuerySet(object):
 
     def __init__(self, document, filters=None, ordering=None):
         self.document = document
-        self._filters = filters or {}
-        self._ordering = ordering or []
+        # filters and ordering are copied so that querysets never share
+        # (and mutate) each other's state
+        self._filters = dict(filters or {})
+        self._ordering = list(ordering or [])
+        self._compiled_filters = None
+        self._only_fields = []
+        self._deferred_fields = []
+        self._after = None
+        self._values_fields = None
+        self._annotations = None
+        self._allow_disk_use = False
+        self._find_options = {}
+        self._batch_size = None
+        self._max_time_ms = None
+        self._use_cache = False
+        self._cache_timeout = None
+        self._related_ids = []
+        self._id_range = None
         self.offset = None
         self.limit = None
+        self._result_cache = None
 
     def __iter__(self):
-        for item in self.get_items():
-            yield self.document(data=item)
+        self._fill_cache()
+        return iter(self._result_cache)
+
+    def __nonzero__(self):
+        self._fill_cache()
+        return bool(self._result_cache)
 
     def __getitem__(self, index):
         if isinstance(index, slice):
@@ -28,33 +63,96 @@ class QuerySet(object):
                 queryset.limit = limit
             return queryset
         if isinstance(index, int):
+            if self._result_cache is not None:
+                return self._result_cache[index]
             return list(self.clone()[index:index+1])[0]
         raise TypeError("QuerySet index should be int or slice (is: %s)"
             % index.__class__)
 
     def __len__(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
         return self.count()
 
+    def _iter_results(self):
+        if self._annotations:
+            pipeline = self.get_annotate_pipeline()
+            for row in self.get_cached(('aggregate', pipeline),
+                    lambda: self.get_aggregation_cursor(pipeline)):
+                yield row
+        elif self._values_fields is not None:
+            fields = dict((field.replace('__', '.'), True)
+                for field in self._values_fields)
+            fields['_id'] = '_id' in fields
+            for item in self.get_cached_items(fields=fields):
+                yield dict((field, get_path(item, field.replace('__', '.')))
+                    for field in self._values_fields)
+        else:
+            for item in self.get_cached_items():
+                yield self.document.from_db(item)
+
+    def _fill_cache(self):
+        """
+        Fetches all results of the queryset, unless they were fetched
+        already. Cache is not passed to clones.
+        """
+        if self._result_cache is None:
+            self._result_cache = list(self._iter_results())
+            if (self._related_ids and self._values_fields is None and
+                self._result_cache):
+                self.resolve_related_ids(self._result_cache)
+
     @property
     def collection(self):
         return self.document._default_manager.collection
 
     def get_filters(self):
-        for key in (k for k in self._filters if '__' in k):
-            field, operator = key.split('__', 1)
-            if operator == 'in':
-                self._filters[field] = {'$in': list(self._filters.pop(key))}
-            elif operator in ['gt', 'gte', 'lt', 'lte']:
-                self._filters[field] = {'$' + operator: self._filters.pop(key)}
-            elif operator in ['contains', 'icontains']:
-                pat = r'.*%s.*' % self._filters.pop(key)
-                if operator[0] == 'i':
-                    pattern = re.compile(pat, re.IGNORECASE)
-                else:
-                    pattern = re.compile(pat)
-                self._filters[field] = pattern
+        """
+        Returns query document compiled from the filters. Result is memoized
+        and must not be modified.
+        """
+        if self._compiled_filters is None:
+            query = compile_filters(self._filters)
+            if self._id_range is not None:
+                query = get_range_query(query, *self._id_range)
+            if self._after is not None:
+                query = self.add_keyset_filters(query, self._after)
+            self._compiled_filters = query
+        return self._compiled_filters
 
-        return self._filters
+    def add_keyset_filters(self, query, sort_key):
+        """
+        Returns ``query`` extended by condition matching only items placed
+        after ``sort_key`` by current ordering.
+        """
+        ordering = self.get_ordering().items()
+        clauses = []
+        for pos, (key, direction) in enumerate(ordering):
+            # ``None`` (missing or null value) matches both missing and null
+            # values, which are sorted before any other values
+            clause = dict((previous, value) for (previous, _), value
+                in zip(ordering[:pos], sort_key[:pos]))
+            value = sort_key[pos]
+            if direction == pymongo.ASCENDING:
+                if value is None:
+                    clause[key] = {'$ne': None}
+                else:
+                    clause[key] = {'$gt': value}
+            elif value is None:
+                # nothing is placed after missing values
+                continue
+            elif key == '_id':
+                clause[key] = {'$lt': value}
+            else:
+                clause['$or'] = [{key: {'$lt': value}}, {key: None}]
+            clauses.append(clause)
+        if len(clauses) == 1 and not set(clauses[0]) & set(query):
+            query.update(clauses[0])
+        elif '$or' not in query:
+            query['$or'] = clauses
+        else:
+            query = {'$and': [query, {'$or': clauses}]}
+        return query
 
     def get_ordering(self):
         ordering = SortedDict()
@@ -67,20 +165,56 @@ class QuerySet(object):
             ordering[key] = val
         return ordering
 
+    def get_projection(self):
+        """
+        Returns ``fields`` specification for ``find`` or ``None`` if whole
+        documents should be fetched.
+        """
+        if self._only_fields:
+            return dict((field, True) for field in self._only_fields
+                if field not in self._deferred_fields)
+        if self._deferred_fields:
+            return dict((field, False) for field in self._deferred_fields)
+        return None
+
     def clone(self):
-        queryset = QuerySet(self.document, self._filters, self._ordering)
+        queryset = self.__class__(self.document, self._filters, self._ordering)
+        queryset._compiled_filters = self._compiled_filters
+        queryset._only_fields = self._only_fields[:]
+        queryset._deferred_fields = self._deferred_fields[:]
+        queryset._after = self._after
+        queryset._values_fields = self._values_fields
+        queryset._annotations = self._annotations
+        queryset._allow_disk_use = self._allow_disk_use
+        queryset._find_options = self._find_options.copy()
+        queryset._batch_size = self._batch_size
+        queryset._max_time_ms = self._max_time_ms
+        queryset._use_cache = self._use_cache
+        queryset._cache_timeout = self._cache_timeout
+        queryset._related_ids = self._related_ids[:]
+        queryset._id_range = self._id_range
         queryset.offset = self.offset
         queryset.limit = self.limit
         return queryset
 
     def all(self):
-        return self
+        """
+        Returns copy of the queryset, which fetches results again (i.e. if
+        the queryset was already evaluated or is shared).
+        """
+        return self.clone()
 
-    def get_items(self):
+    def get_items(self, fields=None):
         """
         Returns pymongo result set.
+
+        :param fields: projection passed to ``find``; defaults to the one
+          built from ``only``/``defer`` calls
         """
-        items = self.collection.find(self.get_filters())
+        if fields is None:
+            fields = self.get_projection()
+        items = self.collection.find(self.get_filters(), fields=fields,
+            **self._find_options)
         ordering = self.get_ordering()
         if ordering:
             items = items.sort(ordering.items())
@@ -88,26 +222,421 @@ class QuerySet(object):
             items.skip(self.offset)
         if self.limit:
             items.limit(self.limit)
+        if self._batch_size:
+            items.batch_size(self._batch_size)
+        if self._max_time_ms:
+            items.max_time_ms(self._max_time_ms)
         return items
 
+    def explain(self):
+        """
+        Returns plan of the query chosen by the server - dictionary with
+        ``winning_plan``, ``stages`` (names of all stages of the winning
+        plan, i.e. ``COLLSCAN``, ``IXSCAN``, ``SORT``), ``keys_examined``,
+        ``docs_examined``, ``returned``, ``time`` (milliseconds) and ``raw``
+        output of the server.
+        """
+        return normalize_explain(self.get_items().explain())
+
+    def cache(self, timeout=None):
+        """
+        Returns queryset which results (and count) are stored in the cache
+        (see ``djmongo.querycache``) for ``timeout`` seconds (or cache's
+        default timeout). Cached results are dropped after any write to the
+        collection made by djmongo. Cache has to be enabled by document's
+        ``Meta.query_cache``.
+        """
+        if not self.document._meta.query_cache:
+            raise ImproperlyConfigured("%s.Meta.query_cache has to be set to "
+                "cache its queries" % self.document.__name__)
+        queryset = self.clone()
+        queryset._use_cache = True
+        queryset._cache_timeout = timeout
+        return queryset
+
+    def get_cached(self, query, fetch):
+        """
+        Returns results returned by ``fetch`` call. If the queryset uses
+        cache they are listed and cached under the key made of ``query``.
+        """
+        if not self._use_cache:
+            return fetch()
+        cache = get_query_cache()
+        key = get_cache_key(self.document._meta.collection_name, query)
+        result = cache.get(key)
+        if result is None:
+            result = list(fetch())
+            cache.set(key, result, self._cache_timeout)
+        return result
+
+    def get_cached_items(self, fields=None):
+        """
+        Same as ``get_items`` but results are taken from the cache if the
+        queryset uses it.
+        """
+        if fields is None:
+            fields = self.get_projection()
+        query = ('find', self.get_filters(), self.get_ordering().items(),
+            self.offset, self.limit, fields, self.get_read_options())
+        return self.get_cached(query, lambda: self.get_items(fields=fields))
+
+    def iterator(self, exhaust=False):
+        """
+        Returns iterator over results which doesn't fill result cache, so
+        whole collection may be scanned with constant memory.
+
+        :param exhaust: if server should stream all batches without waiting
+          for further requests (can't be used with slicing or ``mongos``)
+        """
+        queryset = self
+        if exhaust:
+            queryset = self.clone()
+            queryset._find_options['exhaust'] = True
+        return queryset._iter_results()
+
+    def get_id_ranges(self, count):
+        """
+        Returns at most ``count`` disjoint ``(lower, upper)`` ranges of
+        ``_id`` (see ``djmongo.parallel.get_ranges``) which split matching
+        documents into parts of similar size.
+        """
+        bounds = []
+        for order in ('_id', '-_id'):
+            queryset = self.clone()
+            queryset._ordering = [order]
+            queryset.offset = None
+            queryset.limit = 1
+            for item in queryset.get_items(fields={'_id': True}):
+                bounds.append(item['_id'])
+        if len(bounds) < 2:
+            return get_ranges([])
+        return get_ranges(get_split_points(bounds[0], bounds[1], count))
+
+    def get_range_querysets(self, count):
+        """
+        Returns list of unordered querysets, each matching documents with
+        ``_id`` from one of ``get_id_ranges(count)``.
+        """
+        querysets = []
+        for lower, upper in self.get_id_ranges(count):
+            queryset = self.clone()
+            queryset._ordering = []
+            queryset._id_range = (lower, upper)
+            queryset._compiled_filters = None
+            querysets.append(queryset)
+        return querysets
+
+    def _check_parallel_scan(self):
+        if self.offset is not None or self.limit is not None:
+            raise TypeError("Cannot scan sliced queryset in parallel")
+        if self._annotations:
+            raise TypeError("Cannot scan annotated queryset in parallel")
+        if self._after is not None:
+            raise TypeError("Cannot scan queryset limited by after() in "
+                "parallel")
+
+    def parallel_iter(self, workers=4, queue_size=None):
+        """
+        Returns iterator over matching documents (in no particular order)
+        which are fetched concurrently by ``workers`` threads, each scanning
+        different ranges of ``_id``. Threads wait if ``queue_size`` (by
+        default ``100`` per worker) documents are not consumed yet.
+        """
+        self._check_parallel_scan()
+        querysets = self.get_range_querysets(workers * RANGES_PER_WORKER)
+        return iter_threads(querysets, workers,
+            queue_size=queue_size or workers * 100)
+
+    def parallel_map(self, func, workers=4, processes=True,
+                     chunk_size=None):
+        """
+        Returns iterator over results of ``func`` called with each matching
+        document, as soon as they are computed by ``workers`` processes (or
+        threads if ``processes`` is ``False``). Each process scans different
+        ranges of ``_id`` with its own connection, ``chunk_size`` documents
+        at once (see ``djmongo.parallel``); ``func`` has to be picklable
+        (module level function) then.
+        """
+        self._check_parallel_scan()
+        if processes and self._values_fields is not None:
+            raise TypeError("Cannot map values of a queryset in processes")
+        querysets = self.get_range_querysets(workers * RANGES_PER_WORKER)
+        if not processes:
+            return iter_threads(querysets, workers, func=func,
+                queue_size=workers * 100)
+        return iter_processes(querysets, func, workers, chunk_size)
+
+    def batch_size(self, size):
+        """
+        Returns queryset which fetches results in batches of ``size``
+        documents.
+        """
+        queryset = self.clone()
+        queryset._batch_size = size
+        return queryset
+
+    def timeout(self, ms):
+        """
+        Returns queryset which is aborted by the server if it runs longer
+        than ``ms`` milliseconds.
+        """
+        queryset = self.clone()
+        queryset._max_time_ms = ms
+        return queryset
+
+    def no_timeout(self):
+        """
+        Returns queryset which cursor is never closed by the server due to
+        inactivity. Such cursor should be always exhausted.
+        """
+        queryset = self.clone()
+        queryset._find_options['timeout'] = False
+        return queryset
+
+    def using_read_preference(self, read_preference, tag_sets=None):
+        """
+        Returns queryset which reads from replica set members chosen by
+        ``read_preference`` (one of ``pymongo.ReadPreference`` modes or its
+        name, i.e. ``'secondary_preferred'``) instead of the one set for the
+        document.
+
+        :param tag_sets: list of tag sets members are filtered by
+        """
+        queryset = self.clone()
+        queryset._find_options['read_preference'] = get_read_preference(
+            read_preference)
+        if tag_sets is not None:
+            queryset._find_options['tag_sets'] = tag_sets
+        return queryset
+
+    def get_read_options(self):
+        """
+        Returns read preference options passed with queries and commands.
+        """
+        return dict((key, value) for key, value in self._find_options.items()
+            if key in ('read_preference', 'tag_sets'))
+
     def pluck(self, *keys):
-        for item in self.get_items():
+        fields = dict((key, True) for key in keys)
+        if '_id' not in fields:
+            fields['_id'] = False
+        for item in self.get_items(fields=fields):
             if len(keys) == 1:
                 yield item.get(keys[0], None)
             else:
                 yield tuple(item.get(key) for key in keys)
 
     def count(self):
-        return self.get_items().count()
+        if self._annotations:
+            return self.count_groups()
+        if not self._use_cache:
+            return self.get_items().count()
+        return self.get_cached(('count', self.get_filters()),
+            lambda: [self.get_items().count()])[0]
+
+    def values(self, *fields):
+        """
+        Returns queryset which yields dictionaries with given ``fields``
+        (nested ones are passed as ``author__name``) instead of documents.
+        Followed by ``annotate`` it defines fields used for grouping.
+        """
+        queryset = self.clone()
+        queryset._values_fields = fields
+        return queryset
+
+    def annotate(self, **aggregates):
+        """
+        Returns queryset which yields one dictionary per distinct combination
+        of ``values`` fields, with given ``aggregates`` computed for each
+        group at the server. Ordering and slicing apply to the groups.
+        """
+        if self._values_fields is None:
+            raise TypeError("annotate() must be preceded by values()")
+        queryset = self.clone()
+        queryset._annotations = SortedDict(self._annotations or {})
+        queryset._annotations.update(aggregates)
+        return queryset
+
+    def aggregate(self, **aggregates):
+        """
+        Returns dictionary with given ``aggregates`` computed at the server
+        over all matching documents, i.e.::
+
+            Item.objects.filter(status='paid').aggregate(total=Sum('price'))
+
+        """
+        group = {'_id': None}
+        for alias, aggregate in aggregates.items():
+            group[alias] = aggregate.as_accumulator()
+        pipeline = self.get_match_pipeline() + [{'$group': group}]
+        row = {}
+        for row in self.get_aggregation_cursor(pipeline):
+            break
+        return dict((alias, row.get(alias, aggregate.empty_value))
+            for alias, aggregate in aggregates.items())
+
+    def distinct(self, field):
+        """
+        Returns list of distinct values of ``field`` for matching documents.
+        """
+        return self.collection.find(self.get_filters(),
+            **self.get_read_options()).distinct(
+            field.replace('__', '.'))
+
+    def allow_disk_use(self, value=True):
+        """
+        Returns queryset which allows server to use temporary files for
+        large aggregations.
+        """
+        queryset = self.clone()
+        queryset._allow_disk_use = value
+        return queryset
+
+    def get_match_pipeline(self):
+        query = self.get_filters()
+        if query:
+            return [{'$match': query}]
+        return []
+
+    def get_annotate_pipeline(self):
+        """
+        Returns ``$match``/``$group``/``$sort`` pipeline for querysets built
+        with ``values(...).annotate(...)``.
+        """
+        group = {'_id': dict((field, '$' + field.replace('__', '.'))
+            for field in self._values_fields)}
+        project = {'_id': 0}
+        for field in self._values_fields:
+            project[field] = '$_id.' + field
+        for alias, aggregate in self._annotations.items():
+            group[alias] = aggregate.as_accumulator()
+            project[alias] = 1
+        pipeline = self.get_match_pipeline()
+        pipeline += [{'$group': group}, {'$project': project}]
+        ordering = self.get_ordering()
+        if ordering:
+            pipeline.append({'$sort': SON(ordering.items())})
+        if self.offset:
+            pipeline.append({'$skip': self.offset})
+        if self.limit:
+            pipeline.append({'$limit': self.limit})
+        return pipeline
+
+    def count_groups(self):
+        """
+        Returns number of groups of ``values(...).annotate(...)`` queryset,
+        counted at the server.
+        """
+        pipeline = [stage for stage in self.get_annotate_pipeline()
+            if '$project' not in stage and '$sort' not in stage]
+        pipeline.append({'$group': {'_id': None, 'count': {'$sum': 1}}})
+        for row in self.get_cached(('aggregate', pipeline),
+                lambda: self.get_aggregation_cursor(pipeline)):
+            return row['count']
+        return 0
+
+    def get_aggregation_cursor(self, pipeline):
+        """
+        Runs aggregation ``pipeline`` and returns cursor over its results.
+        """
+        options = {'cursor': {}}
+        if self._batch_size:
+            options['cursor']['batchSize'] = self._batch_size
+        if self._max_time_ms:
+            options['maxTimeMS'] = self._max_time_ms
+        if self._allow_disk_use:
+            options['allowDiskUse'] = True
+        options.update(self.get_read_options())
+        return self.collection.aggregate(pipeline, **options)
 
     def add_filters(self, **filters):
         self._filters.update(filters)
+        self._compiled_filters = None
 
     def filter(self, **filters):
         queryset = self.clone()
         queryset.add_filters(**filters)
         return queryset
 
+    def search(self, text, language=None):
+        """
+        Returns queryset filtered by ``$text`` search. Requires a text index
+        (``Index([('field', Index.TEXT)])``) to be declared for the document.
+        """
+        search = {'$search': text}
+        if language:
+            search['$language'] = language
+        return self.filter(**{'$text': search})
+
+    def select_related_ids(self, field, document, to_attr=None):
+        """
+        Returns queryset which resolves ids stored at ``field`` (single id or
+        list of them) of its documents into ``document`` instances, i.e.::
+
+            for book in Book.objects.all().select_related_ids('author_id',
+                    document=Author):
+                print book.author
+
+        Ids of all fetched documents are resolved by ``in_bulk``, with one
+        query per referenced document class. Documents are set as
+        ``to_attr`` attribute (``field`` without ``_id`` suffix by default;
+        ``None`` or skipped if missing). Doesn't apply to ``iterator()``.
+        """
+        if to_attr is None:
+            if field.endswith('_id') and len(field) > 3:
+                to_attr = field[:-3]
+            else:
+                to_attr = field + '_document'
+        queryset = self.clone()
+        queryset._related_ids.append((field, document, to_attr))
+        return queryset
+
+    def resolve_related_ids(self, items):
+        """
+        Sets documents referenced by ``select_related_ids`` fields on given
+        ``items``.
+        """
+        ids = SortedDict()
+        for field, document, to_attr in self._related_ids:
+            document_ids = ids.setdefault(document, [])
+            for item in items:
+                value = get_path(item._data, field.replace('__', '.'))
+                if isinstance(value, list):
+                    document_ids.extend(value)
+                elif value is not None:
+                    document_ids.append(value)
+        related = dict((document, document._default_manager.in_bulk(
+            document_ids)) for document, document_ids in ids.items())
+        for field, document, to_attr in self._related_ids:
+            documents = related[document]
+            for item in items:
+                value = get_path(item._data, field.replace('__', '.'))
+                if isinstance(value, list):
+                    setattr(item, to_attr, [documents[_id] for _id in value
+                        if _id in documents])
+                else:
+                    setattr(item, to_attr, documents.get(value))
+
+    def only(self, *fields):
+        """
+        Returns queryset which would fetch only given ``fields`` (and
+        ``_id``) of the documents.
+        """
+        queryset = self.clone()
+        queryset._only_fields = list(fields)
+        return queryset
+
+    def defer(self, *fields):
+        """
+        Returns queryset which would not fetch given ``fields`` of the
+        documents.
+        """
+        queryset = self.clone()
+        for field in fields:
+            if field not in queryset._deferred_fields:
+                queryset._deferred_fields.append(field)
+        return queryset
+
     def add_ordering(self, ordering):
         if ordering not in self._ordering:
             self._ordering.append(ordering)
@@ -115,28 +644,177 @@ class QuerySet(object):
     def order_by(self, ordering):
         queryset = self.clone()
         queryset.add_ordering(ordering)
+        # sort key given to ``after`` doesn't apply to the new ordering
+        if queryset._after is not None:
+            queryset._after = None
+            queryset._compiled_filters = None
         return queryset
 
+    def get_keyset_queryset(self):
+        """
+        Returns clone ordered by current ordering with ``_id`` appended as
+        a tie-breaker (if it's not already there).
+        """
+        queryset = self.clone()
+        ordering = self.get_ordering()
+        if '_id' not in ordering:
+            descending = ordering and ordering.values()[-1] == pymongo.DESCENDING
+            queryset.add_ordering(descending and '-_id' or '_id')
+        return queryset
+
+    def get_sort_key(self, document):
+        """
+        Returns values of the ordering fields (and ``_id``) of ``document``.
+        """
+        keys = self.get_keyset_queryset().get_ordering().keys()
+        return tuple(get_path(document._data, key) for key in keys)
+
+    def after(self, sort_key):
+        """
+        Returns queryset of items placed after ``sort_key`` (as returned by
+        ``get_sort_key``) or after given document. Unlike slicing with an
+        offset, cost of such query doesn't depend on position of the item.
+        """
+        if not isinstance(sort_key, (tuple, list)):
+            sort_key = self.get_sort_key(sort_key)
+        queryset = self.get_keyset_queryset()
+        if len(sort_key) != len(queryset.get_ordering()):
+            raise ValueError("Sort key %r doesn't match ordering %r" % (
+                sort_key, queryset._ordering))
+        queryset._after = tuple(sort_key)
+        queryset._compiled_filters = None
+        return queryset
+
+    def paginate_by_key(self, per_page, after=None):
+        """
+        Returns ``(items, next_key)`` pair, where ``items`` is a list of at
+        most ``per_page`` items placed after ``after`` sort key and
+        ``next_key`` should be passed to fetch the next page (it's ``None``
+        for the last page).
+        """
+        if after is None:
+            queryset = self.get_keyset_queryset()
+        else:
+            queryset = self.after(after)
+        items = list(queryset[:per_page + 1])
+        next_key = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            next_key = queryset.get_sort_key(items[-1])
+        return items, next_key
+
     def get(self, **filters):
-        result = None
-        for item in self.filter(**filters):
-            if result is not None:
-                raise MultipleItemsReturnedError("More than one item found "
-                    "for filters: %r" % filters)
-            else:
-                result = item
-        if result is None:
+        queryset = self.filter(**filters)
+        # ordering is irrelevant for a single item and would only prevent
+        # server from choosing the best index
+        queryset._ordering = []
+        if queryset.limit is None or queryset.limit > 2:
+            queryset.limit = 2
+        items = list(queryset)
+        if len(items) > 1:
+            raise MultipleItemsReturnedError("More than one item found "
+                "for filters: %r" % filters)
+        if not items:
             raise self.document.DoesNotExist("No item found for filters: %r"
                 % filters)
-        return result
+        return items[0]
+
+    def get_or_none(self, **filters):
+        """
+        Same as ``get`` but returns ``None`` if there is no matching item.
+        """
+        try:
+            return self.get(**filters)
+        except self.document.DoesNotExist:
+            return None
+
+    def first(self):
+        """
+        Returns first item (by current ordering or by ``_id``) or ``None``.
+        """
+        if self._result_cache is not None:
+            return self._result_cache[0] if self._result_cache else None
+        queryset = self.clone()
+        if not queryset._ordering and not self._annotations:
+            queryset._ordering = ['_id']
+        queryset.limit = 1
+        items = list(queryset)
+        return items[0] if items else None
+
+    def last(self):
+        """
+        Returns last item (by current ordering or by ``_id``) or ``None``.
+        """
+        if (self._result_cache is not None or self.offset is not None or
+            self.limit is not None):
+            items = list(self)
+            return items[-1] if items else None
+        queryset = self.clone()
+        queryset._ordering = self.get_reversed_ordering()
+        return queryset.first()
+
+    def get_reversed_ordering(self):
+        """
+        Returns current ordering (``_id`` by default) reversed.
+        """
+        return [order[1:] if order[0] == '-' else '-' + order
+            for order in self._ordering or ['_id']]
 
-    def update_raw(self, data, safe=True, upsert=False, multi=True):
+    def exists(self):
+        """
+        Returns ``True`` if there is at least one matching item. Only ``_id``
+        of a single document is fetched.
+        """
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        queryset = self.clone()
+        queryset._ordering = []
+        if self._annotations:
+            queryset.limit = 1
+            return bool(list(queryset))
+        items = queryset.get_items(fields={'_id': True}).limit(1)
+        for item in items:
+            return True
+        return False
+
+    def get_write_options(self, safe=True, write_concern=None):
+        return self.document._default_manager.get_write_options(safe,
+            write_concern)
+
+    def update_raw(self, data, safe=True, upsert=False, multi=True,
+                   write_concern=None):
         dataset = {'$set': data or {}}
-        return self.collection.update(self.get_filters(), dataset, safe=safe,
-            upsert=upsert, multi=multi)
+        result = self.collection.update(self.get_filters(), dataset,
+            upsert=upsert, multi=multi,
+            **self.get_write_options(safe, write_concern))
+        self.document._default_manager._collection_changed()
+        return result
 
-    def update(self, safe=True, upsert=False, **data):
-        return self.update_raw(data, safe=safe, upsert=upsert)
+    def update(self, safe=True, upsert=False, write_concern=None, **data):
+        """
+        Updates all matching documents with a single request. Keys of
+        ``data`` may use operator prefixes (``inc__``, ``push__``, ``pull__``,
+        ``add_to_set__``, ``unset__``, ``min__``, ``max__``, ``set__``), other
+        keys are ``$set``.
+        """
+        if self.offset is not None or self.limit is not None:
+            raise TypeError("Cannot update items of a sliced queryset")
+        result = self.collection.update(self.get_filters(),
+            compile_update(data), upsert=upsert, multi=True,
+            **self.get_write_options(safe, write_concern))
+        self.document._default_manager._collection_changed()
+        return result
+
+    def delete(self, safe=True, write_concern=None):
+        """
+        Removes all matching documents with a single request.
+        """
+        if self.offset is not None or self.limit is not None:
+            raise TypeError("Cannot delete items of a sliced queryset")
+        result = self.collection.remove(self.get_filters(),
+            **self.get_write_options(safe, write_concern))
+        self.document._default_manager._collection_changed()
+        return result
 
 
     @property
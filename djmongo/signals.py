@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent after each operation issued by documents' managers and querysets, if
+# there is any receiver connected. ``sender`` is the document class.
+query_executed = Signal(providing_args=['using', 'operation', 'collection',
+    'filter', 'duration', 'documents', 'bytes'])
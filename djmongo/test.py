@@ -1,5 +1,6 @@
 from django.test import TestCase as BaseTestCase
 from djmongo.utils import get_mongodb_connections
+from djmongo import document
 from djmongo.document import Document
 from djmongo.utils import can_drop_collection
 
@@ -7,7 +8,14 @@ from djmongo.utils import can_drop_collection
 class TestCase(BaseTestCase):
 
     def __call__(self, *args, **kwargs):
-        result = super(TestCase, self).__call__(*args, **kwargs)
+        documents = document._documents.copy()
+        try:
+            result = super(TestCase, self).__call__(*args, **kwargs)
+        finally:
+            # documents defined by the test are forgotten, so they are not
+            # processed by ``ensure_all_indexes`` in other tests
+            document._documents.clear()
+            document._documents.update(documents)
         self.post_teardown()
         return result
 
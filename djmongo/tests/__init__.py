@@ -1,6 +1,15 @@
+from test_admin import *
+from test_aggregates import *
 from test_db import *
 from test_document import *
+from test_explain import *
+from test_identitymap import *
+from test_instrumentation import *
+from test_lookups import *
 from test_manager import *
+from test_nonblocking import *
+from test_parallel import *
+from test_querycache import *
 from test_querysets import *
 from test_test_case import *
 from test_utils import *
@@ -0,0 +1,133 @@
+from bson import ObjectId
+from bson.tz_util import utc
+from datetime import datetime
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+from django.test.client import RequestFactory
+from django.utils.html import escape
+from djmongo.test import TestCase
+from djmongo.admin import DocumentAdmin
+from djmongo.admin import DocumentChangeList
+from djmongo.admin import decode_sort_key
+from djmongo.admin import encode_sort_key
+from djmongo.document import Document
+from djmongo.document import Index
+import base64
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestDocumentAdmin(TestCase):
+
+    def get_admin(self, indexes, search_field='title'):
+        Item._meta.indexes = indexes
+        self.addCleanup(setattr, Item._meta, 'indexes', [])
+        document_admin = DocumentAdmin(Item, admin.site)
+        document_admin.search_field = search_field
+        return document_admin
+
+    def test_search_lookup_without_indexes(self):
+        self.assertEqual(self.get_admin([]).get_search_lookup(), 'icontains')
+
+    def test_search_lookup_for_indexed_prefix(self):
+        document_admin = self.get_admin([Index([('title', 1), ('year', 1)])])
+        self.assertEqual(document_admin.get_search_lookup(), 'startswith')
+        document_admin.prefix_search_lookup = 'istartswith'
+        self.assertEqual(document_admin.get_search_lookup(), 'istartswith')
+
+    def test_search_lookup_for_text_index(self):
+        indexes = [Index([('title', Index.TEXT), ('body', Index.TEXT)])]
+        self.assertEqual(self.get_admin(indexes).get_search_lookup(),
+            'search')
+        self.assertEqual(self.get_admin(indexes, search_field='author')
+            .get_search_lookup(), 'icontains')
+
+    def test_search_results(self):
+        Item.objects.create(data={'title': 'Slayer'})
+        Item.objects.create(data={'title': 'Sabaton'})
+        document_admin = self.get_admin([Index('title')])
+        results = document_admin.get_search_results(Item.objects.all(), 'Sla')
+        self.assertEqual([item.data['title'] for item in results], ['Slayer'])
+        self.assertFalse(document_admin.get_search_results(
+            Item.objects.all(), 'sla'))
+
+
+class TestSortKeyEncoding(TestCase):
+
+    def test_encode_and_decode(self):
+        sort_key = (ObjectId(), datetime(2012, 1, 1, tzinfo=utc), u'Slayer', None, 1)
+        encoded = encode_sort_key(sort_key)
+        self.assertEqual(decode_sort_key(encoded), sort_key)
+
+    def test_decode_malformed_key(self):
+        encoded = encode_sort_key((1, 2))
+        for value in (encoded[:-3], 'abc', u'\u017c',
+                      base64.urlsafe_b64encode('1'),
+                      base64.urlsafe_b64encode('{"a": 1}')):
+            with self.assertRaises(ValueError):
+                decode_sort_key(value)
+
+
+class TestDocumentChangeList(TestCase):
+
+    def setUp(self):
+        Item.objects.insert_many([{'number': x} for x in range(5)])
+        self.document_admin = DocumentAdmin(Item, admin.site)
+        self.document_admin.list_per_page = 2
+        self.factory = RequestFactory()
+
+    def get_changelist(self, url='/'):
+        return DocumentChangeList(self.factory.get(url), self.document_admin,
+            Item.objects.all())
+
+    def get_numbers(self, changelist):
+        return [item.data['number'] for item in changelist.get_results()]
+
+    def test_pages(self):
+        changelist = self.get_changelist('/?query=x')
+        self.assertEqual(self.get_numbers(changelist), [0, 1])
+        self.assertTrue(changelist.multi_page)
+        numbers = self.get_numbers(changelist)
+        while changelist.get_next_page_url():
+            url = changelist.get_next_page_url()
+            self.assertIn('query=x', url)
+            changelist = self.get_changelist('/' + url)
+            numbers += self.get_numbers(changelist)
+        self.assertEqual(numbers, range(5))
+        self.assertEqual(changelist.result_count, 1)
+        self.assertEqual(changelist.get_first_page_url(), '?query=x')
+
+    def test_malformed_after_shows_first_page(self):
+        changelist = self.get_changelist('/?after=abc&query=x')
+        self.assertIsNone(changelist.after)
+        self.assertEqual(self.get_numbers(changelist), [0, 1])
+        self.assertEqual(changelist.get_first_page_url(), '?query=x')
+
+    def test_pagination_template(self):
+        changelist = self.get_changelist()
+        html = render_to_string('admin/djmongo/pagination.html',
+            {'cl': changelist})
+        self.assertIn('href="%s"' % escape(changelist.get_next_page_url()),
+            html)
+        self.assertNotIn('First page', html)
+
+        changelist = self.get_changelist('/' +
+            changelist.get_next_page_url())
+        html = render_to_string('admin/djmongo/pagination.html',
+            {'cl': changelist})
+        self.assertIn('First page', html)
+
+    def test_changelist_view(self):
+        request = self.factory.get('/', {'query': 'x'})
+        request.user = AnonymousUser()
+        self.document_admin.search_field = 'number'
+        self.document_admin.document_list_display = ['number']
+        Item.objects.create(data={'number': 'x'})
+        response = self.document_admin.changelist_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('name="query" value="x"', response.content)
+        self.assertIn('<td>x</td>', response.content)
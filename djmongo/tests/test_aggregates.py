@@ -0,0 +1,121 @@
+from djmongo.aggregates import Avg
+from djmongo.aggregates import Count
+from djmongo.aggregates import Max
+from djmongo.aggregates import Min
+from djmongo.aggregates import Sum
+from djmongo.document import Document
+from djmongo.querysets import QuerySet
+from djmongo.test import TestCase
+from mock import patch
+
+
+class Order(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestAggregates(TestCase):
+
+    def test_as_accumulator(self):
+        self.assertEqual(Count().as_accumulator(), {'$sum': 1})
+        self.assertEqual(Sum('price').as_accumulator(), {'$sum': '$price'})
+        self.assertEqual(Avg('price').as_accumulator(), {'$avg': '$price'})
+        self.assertEqual(Min('item__price').as_accumulator(),
+            {'$min': '$item.price'})
+        self.assertEqual(Max('price').as_accumulator(), {'$max': '$price'})
+
+
+class TestAggregation(TestCase):
+
+    def setUp(self):
+        for x in range(1, 11):
+            Order.objects.create(data={
+                'id': x,
+                'status': x % 2 and 'paid' or 'new',
+                'price': x * 10,
+                'customer': {'country': x > 3 and 'PL' or 'DE'},
+            })
+
+    def test_aggregate(self):
+        self.assertEqual(Order.objects.filter(status='paid').aggregate(
+            total=Sum('price'), count=Count(), max=Max('price')),
+            {'total': 250, 'count': 5, 'max': 90})
+
+    def test_aggregate_without_matching_documents(self):
+        # server returns no groups at all if nothing matched
+        with patch.object(QuerySet, 'collection') as collection:
+            collection.aggregate.return_value = iter([])
+            self.assertEqual(Order.objects.filter(status='foo').aggregate(
+                total=Sum('price'), count=Count()), {'total': None, 'count': 0})
+
+    def test_values(self):
+        self.assertEqual(list(Order.objects.filter(id__lte=2).order_by('id')
+            .values('id', 'customer__country')), [
+            {'id': 1, 'customer__country': 'DE'},
+            {'id': 2, 'customer__country': 'DE'},
+        ])
+
+    def test_values_annotate(self):
+        result = Order.objects.values('status').annotate(count=Count(),
+            total=Sum('price')).order_by('status')
+        self.assertEqual(list(result), [
+            {'status': 'new', 'count': 5, 'total': 300},
+            {'status': 'paid', 'count': 5, 'total': 250},
+        ])
+
+    def test_values_annotate_nested_fields(self):
+        result = Order.objects.filter(status='paid').values(
+            'customer__country').annotate(count=Count()).order_by('-count')
+        self.assertEqual(list(result), [
+            {'customer__country': 'PL', 'count': 3},
+            {'customer__country': 'DE', 'count': 2},
+        ])
+
+    def test_len_and_count_of_annotated_queryset(self):
+        queryset = Order.objects.values('customer__country').annotate(
+            count=Count())
+        self.assertEqual(queryset.count(), 2)
+        self.assertEqual(len(queryset), 2)
+        self.assertEqual(queryset[1:].count(), 1)
+        self.assertEqual(queryset.filter(id=100).count(), 0)
+
+    def test_first_exists_and_slicing_of_annotated_queryset(self):
+        queryset = Order.objects.values('status').annotate(
+            total=Sum('price')).order_by('status')
+        self.assertEqual(queryset.first(), {'status': 'new', 'total': 300})
+        self.assertEqual(queryset[1], {'status': 'paid', 'total': 250})
+        self.assertEqual(list(queryset[1:]),
+            [{'status': 'paid', 'total': 250}])
+        self.assertTrue(queryset.exists())
+        self.assertFalse(queryset[2:].exists())
+        self.assertFalse(queryset.filter(id=100).exists())
+
+    def test_annotate_requires_values(self):
+        with self.assertRaises(TypeError):
+            Order.objects.all().annotate(count=Count())
+
+    def test_annotate_pipeline(self):
+        queryset = QuerySet(Order).filter(id__gt=2).values('status').annotate(
+            total=Sum('price')).order_by('-total')[1:3]
+        self.assertEqual(queryset.get_annotate_pipeline(), [
+            {'$match': {'id': {'$gt': 2}}},
+            {'$group': {'_id': {'status': '$status'},
+                'total': {'$sum': '$price'}}},
+            {'$project': {'_id': 0, 'status': '$_id.status', 'total': 1}},
+            {'$sort': {'total': -1}},
+            {'$skip': 1},
+            {'$limit': 2},
+        ])
+
+    def test_allow_disk_use(self):
+        queryset = QuerySet(Order).allow_disk_use()
+        with patch.object(QuerySet, 'collection') as collection:
+            queryset.aggregate(count=Count())
+            self.assertEqual(collection.aggregate.call_args[1],
+                {'cursor': {}, 'allowDiskUse': True})
+
+    def test_distinct(self):
+        self.assertItemsEqual(Order.objects.distinct('customer__country'),
+            ['PL', 'DE'])
+        self.assertItemsEqual(Order.objects.filter(id__lte=3).distinct(
+            'customer__country'), ['DE'])
@@ -1,9 +1,17 @@
 from mock import Mock
+from mock import patch
 from djmongo.test import TestCase
 from djmongo.document import Document
 from djmongo.document import Options
 from djmongo.document import Manager
 from djmongo.document import Index
+from djmongo.document import IndexConflictWarning
+from djmongo.document import ensure_all_indexes
+from djmongo.document import get_documents
+from djmongo.exceptions import DjongoError
+from django.core.management import call_command
+import pymongo
+import warnings
 
 
 class Item(Document):
@@ -64,6 +72,9 @@ class TestMetaOptions(TestCase):
             'collection_name': 'djmongo.tests.adoc',
             'indexes': [],
             'verbose_name': 'ADoc',
+            'read_preference': None,
+            'write_concern': None,
+            'query_cache': False,
         })
 
     def test_using_is_overridden(self):
@@ -93,6 +104,18 @@ class TestMetaOptions(TestCase):
 
         self.assertEqual(MyDocument._meta.indexes, [index])
 
+    def test_read_preference_is_set_for_collection(self):
+
+        class MyDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                read_preference = 'secondary_preferred'
+
+        self.assertEqual(MyDocument._meta.read_preference,
+            'secondary_preferred')
+        self.assertEqual(MyDocument.objects.collection.read_preference,
+            pymongo.ReadPreference.SECONDARY_PREFERRED)
+
 
 class TestIndexes(TestCase):
     maxDiff = None
@@ -119,6 +142,72 @@ class TestIndexes(TestCase):
         ]
         self.assertEqual(sorted(manager.get_indexes()), sorted(expected))
 
+    def test_keys_order_is_preserved(self):
+        index = Index([('user', Index.ASCENDING), ('created', Index.DESCENDING)])
+        self.assertEqual(index.keys, (('user', Index.ASCENDING),
+            ('created', Index.DESCENDING)))
+        self.assertEqual(index.descriptive_keys(), [(u'user', 'Ascending'),
+            (u'created', 'Descending')])
+
+    def test_text_index(self):
+        index = Index([('title', Index.TEXT), ('body', Index.TEXT)])
+        self.assertTrue(index.is_text)
+        self.assertFalse(Index('title').is_text)
+        self.assertEqual(index.descriptive_keys(), [(u'title', 'Text'),
+            (u'body', 'Text')])
+
+    def test_text_index_equals_its_index_information(self):
+        index = Index([('category', Index.ASCENDING), ('title', Index.TEXT),
+            ('body', Index.TEXT)])
+        info = {u'key': [(u'category', 1), (u'_fts', u'text'),
+            (u'_ftsx', 1)], u'weights': {u'title': 1, u'body': 1}, u'v': 1}
+        existing = Index.from_index_information(u'text', info)
+        self.assertEqual(existing.text_fields, [u'body', u'title'])
+        self.assertEqual(existing, index)
+        self.assertNotEqual(existing, Index([('category', Index.ASCENDING),
+            ('title', Index.TEXT)]))
+
+    def test_eq_is_order_sensitive(self):
+        index1 = Index([('user', Index.ASCENDING), ('created', Index.DESCENDING)])
+        index2 = Index([('created', Index.DESCENDING), ('user', Index.ASCENDING)])
+        self.assertNotEqual(index1, index2)
+        self.assertEqual(index1, Index([['user', 1], ['created', -1]]))
+
+    def test_eq_respects_options(self):
+        self.assertNotEqual(Index('title'), Index('title', sparse=True))
+        self.assertNotEqual(Index('created'),
+            Index('created', expire_after_seconds=3600))
+        self.assertNotEqual(Index('title'),
+            Index('title', partial_filter={'rating': {'$gt': 5}}))
+        self.assertEqual(Index('title', background=True), Index('title'))
+
+    def test_create_for_collection(self):
+        collection = Mock()
+        index = Index([('user', Index.ASCENDING), ('created', Index.DESCENDING)],
+            sparse=True, partial_filter={'rating': {'$gt': 5}},
+            expire_after_seconds=3600, name='user_created')
+        index.create_for_collection(collection, background=True)
+        collection.create_index.assert_called_once_with(
+            [('user', Index.ASCENDING), ('created', Index.DESCENDING)],
+            unique=False, background=True, sparse=True, name='user_created',
+            partialFilterExpression={'rating': {'$gt': 5}},
+            expireAfterSeconds=3600)
+
+    def test_get_indexes_reads_options(self):
+        mocked_collection = Mock()
+        mocked_collection.index_information = Mock(return_value={
+            u'created_1': {u'key': [(u'created', 1)], u'v': 1,
+                u'expireAfterSeconds': 3600},
+            u'user_1_created_-1': {u'key': [(u'user', 1), (u'created', -1)],
+                u'v': 1, u'sparse': True},
+        })
+        manager = Manager()
+        manager._get_collection = Mock(return_value=mocked_collection)
+        self.assertItemsEqual(manager.get_indexes(), [
+            Index('created', expire_after_seconds=3600),
+            Index([('user', 1), ('created', -1)], sparse=True),
+        ])
+
     def test_proper_indexes_are_created(self):
 
         index1 = Index('ID', unique=True)
@@ -130,23 +219,74 @@ class TestIndexes(TestCase):
                 indexes = [index1, index2]
 
         IndexedDocument.objects.collection.drop_indexes()
+        # Indexes are not created on the request path
+        IndexedDocument.objects.connection
         indexes = IndexedDocument.objects.get_indexes()
-        IndexedDocument._indexes_already_created = False
-        # Indexes should be created only if there was attempt to make a conn
         self.assertNotIn(index1, indexes)
         self.assertNotIn(index2, indexes)
+        self.assertFalse(IndexedDocument._indexes_already_created)
 
-        IndexedDocument.objects.connection
+        self.assertItemsEqual(IndexedDocument.objects.ensure_indexes(),
+            [index1, index2])
         self.assertIn(index1, IndexedDocument.objects.get_indexes())
         self.assertIn(index2, IndexedDocument.objects.get_indexes())
-
         self.assertTrue(IndexedDocument._indexes_already_created)
-        IndexedDocument.objects.connection
 
-        # Make sure that ensure_indexes is not called once indexes were created
-        IndexedDocument.objects.ensure_indexes = Mock()
-        IndexedDocument.objects.connection
-        self.assertFalse(IndexedDocument.objects.ensure_indexes.called)
+    def test_ensure_indexes_creates_only_missing_ones(self):
+
+        index1 = Index('title')
+        index2 = Index('slug', unique=True)
+
+        class IndexedDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                indexes = [index1, index2]
+
+        index1.create_for_collection(IndexedDocument.objects.collection)
+        self.assertEqual(IndexedDocument.objects.ensure_indexes(), [index2])
+        self.assertEqual(IndexedDocument.objects.ensure_indexes(), [])
+
+    def test_ensure_indexes_skips_conflicting_ones(self):
+
+        class IndexedDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                indexes = [Index('slug', unique=True), Index('title')]
+
+        Index('slug').create_for_collection(IndexedDocument.objects.collection)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(IndexedDocument.objects.ensure_indexes(),
+                [Index('title')])
+        self.assertEqual([warning.category for warning in caught],
+            [IndexConflictWarning])
+        self.assertNotIn(Index('slug', unique=True),
+            IndexedDocument.objects.get_indexes())
+
+    def test_ensure_all_indexes(self):
+
+        class IndexedDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                indexes = [Index('title')]
+
+        result = ensure_all_indexes()
+        self.assertEqual(result[IndexedDocument], [Index('title')])
+        self.assertIn(Index('title'), IndexedDocument.objects.get_indexes())
+
+        # indexes are ensured once per process
+        self.assertNotIn(IndexedDocument, ensure_all_indexes())
+        self.assertIn(IndexedDocument, ensure_all_indexes(force=True))
+
+    def test_ensure_all_indexes_using(self):
+
+        class IndexedDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                indexes = [Index('title')]
+
+        self.assertNotIn(IndexedDocument, ensure_all_indexes(using='other'))
+        self.assertIn(IndexedDocument, ensure_all_indexes(using='mongodb'))
 
     def test_auto_ensure_indexes_is_respected(self):
 
@@ -157,8 +297,39 @@ class TestIndexes(TestCase):
                 using = 'mongodb'
                 indexes = [Index('title')]
 
+        self.assertNotIn(NotYetIndexedDocument, ensure_all_indexes())
         self.assertEqual(NotYetIndexedDocument.objects.get_indexes(), [])
 
+    def test_get_documents(self):
+
+        class RegisteredDocument(Document):
+            pass
+
+        self.assertIn(RegisteredDocument, get_documents())
+        self.assertNotIn(Document, get_documents())
+
+    def test_get_documents_skips_redefined_documents(self):
+
+        class RegisteredDocument(Document):
+            pass
+        first = RegisteredDocument
+
+        class RegisteredDocument(Document):
+            pass
+
+        self.assertIn(RegisteredDocument, get_documents())
+        self.assertNotIn(first, get_documents())
+
+    def test_ensureindexes_command(self):
+
+        class IndexedDocument(Document):
+            class Meta:
+                using = 'mongodb'
+                indexes = [Index('title')]
+
+        call_command('ensureindexes', verbosity=0)
+        self.assertIn(Index('title'), IndexedDocument.objects.get_indexes())
+
 
 class TestDocument(TestCase):
 
@@ -195,6 +366,90 @@ class TestDocument(TestCase):
         self.assertEqual(Item.objects.get(title='Slayer').data.get('genre'),
             'trash metal')
 
+    def test_save_sends_only_changed_keys(self):
+        item = Item.objects.create(data={'title': 'Slayer', 'plays': 1,
+            'stats': {'views': 1}, 'genre': 'metal'})
+        item = Item.objects.get(title='Slayer')
+        item.data['plays'] += 1
+        item.data['stats']['views'] = 2
+        del item.data['genre']
+        with patch.object(Item.objects.collection.__class__, 'update') as m:
+            item.save()
+            self.assertEqual(m.call_args[0][1], {
+                '$set': {'plays': 2, 'stats.views': 2},
+                '$unset': {'genre': 1},
+            })
+
+    def test_save_persists_changes(self):
+        Item.objects.create(data={'title': 'Slayer', 'genre': 'metal'})
+        item = Item.objects.get(title='Slayer')
+        item.data['plays'] = 10
+        del item.data['genre']
+        item.save()
+        data = Item.objects.get(title='Slayer').data
+        del data['_id']
+        self.assertDictEqual(data, {'title': 'Slayer', 'plays': 10})
+
+    def test_save_without_changes_does_not_hit_database(self):
+        Item.objects.create(data={'title': 'Slayer'})
+        item = Item.objects.get(title='Slayer')
+        with patch.object(Item.objects.collection.__class__, 'update') as m:
+            item.save()
+            self.assertFalse(m.called)
+
+    def test_delete(self):
+        item = Item.objects.create(data={'title': 'Slayer'})
+        Item.objects.create(data={'title': 'Sabaton'})
+        item.delete()
+        self.assertIsNone(item.id)
+        self.assertItemsEqual(Item.objects.pluck('title'), ['Sabaton'])
+
+    def test_delete_unsaved_document_raises(self):
+        item = Item.objects.create(data={'title': 'Slayer'})
+        item.delete()
+        with self.assertRaises(DjongoError):
+            item.delete()
+        with self.assertRaises(DjongoError):
+            Item(data={'title': 'Sabaton'}).delete()
+
+    def test_reload(self):
+        item = Item.objects.create(data={'title': 'Slayer', 'plays': 1})
+        Item.objects.filter(title='Slayer').update(inc__plays=2)
+        item.data['foo'] = 'bar'
+        self.assertIs(item.reload(), item)
+        self.assertEqual(item.data['plays'], 3)
+        self.assertNotIn('foo', item.data)
+        self.assertEqual(item.get_changes(), ({}, {}))
+
+    def test_reload_raises_does_not_exist(self):
+        item = Item.objects.create(data={'title': 'Slayer'})
+        Item.objects.filter(title='Slayer').delete()
+        with self.assertRaises(Item.DoesNotExist):
+            item.reload()
+
+    def test_fetched_data_is_copied_on_first_access(self):
+        Item.objects.create(data={'title': 'Slayer', 'tags': ['metal']})
+        with patch('djmongo.document.copy.deepcopy') as deepcopy:
+            items = list(Item.objects.all())
+            self.assertEqual(items[0].id, Item.objects.get().id)
+            self.assertFalse(deepcopy.called)
+        item = items[0]
+        item.data['tags'].append('thrash')
+        self.assertEqual(item.get_changes(),
+            ({'tags': ['metal', 'thrash']}, {}))
+
+    def test_get_changes_for_unsaved_document(self):
+        item = Item(data={'_id': 1, 'title': 'Slayer'})
+        self.assertEqual(item.get_changes(), ({'title': 'Slayer'}, {}))
+
+    def test_get_update(self):
+        item = Item.from_db({'_id': 1, 'title': 'Slayer', 'genre': 'metal'})
+        self.assertIsNone(item.get_update())
+        item.data['plays'] = 1
+        del item.data['genre']
+        self.assertEqual(item.get_update(),
+            {'$set': {'plays': 1}, '$unset': {'genre': 1}})
+
     def test_app_label(self):
         self.assertEqual(Item._meta.app_label, 'djmongo')
 
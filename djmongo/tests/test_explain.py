@@ -0,0 +1,167 @@
+import re
+import warnings
+from django.db import connections
+from djmongo.compat import override_settings
+from djmongo.document import Document
+from djmongo.document import Index
+from djmongo.explain import SlowQueryWarning
+from djmongo.explain import get_stages
+from djmongo.explain import normalize_explain
+from djmongo.explain import suggest_index
+from djmongo.instrumentation import InstrumentedCollection
+from djmongo.querysets import QuerySet
+from djmongo.test import TestCase
+from mock import MagicMock
+from mock import patch
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+EXPLAIN_3 = {
+    'queryPlanner': {
+        'winningPlan': {
+            'stage': 'SORT',
+            'inputStage': {
+                'stage': 'FETCH',
+                'inputStage': {'stage': 'IXSCAN', 'indexName': 'status_1'},
+            },
+        },
+    },
+    'executionStats': {
+        'nReturned': 5,
+        'executionTimeMillis': 3,
+        'totalKeysExamined': 10,
+        'totalDocsExamined': 10,
+    },
+}
+
+EXPLAIN_2 = {
+    'cursor': 'BasicCursor',
+    'n': 5,
+    'nscanned': 100,
+    'nscannedObjects': 100,
+    'scanAndOrder': True,
+    'millis': 7,
+}
+
+
+class TestNormalizeExplain(TestCase):
+
+    def test_get_stages(self):
+        self.assertEqual(get_stages({'stage': 'OR', 'inputStages': [
+            {'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}]}),
+            ['OR', 'IXSCAN', 'COLLSCAN'])
+
+    def test_query_planner_output(self):
+        info = normalize_explain(EXPLAIN_3)
+        self.assertEqual(info['stages'], ['SORT', 'FETCH', 'IXSCAN'])
+        self.assertEqual(info['winning_plan'],
+            EXPLAIN_3['queryPlanner']['winningPlan'])
+        self.assertEqual((info['keys_examined'], info['docs_examined'],
+            info['returned'], info['time']), (10, 10, 5, 3))
+        self.assertIs(info['raw'], EXPLAIN_3)
+
+    def test_legacy_output(self):
+        info = normalize_explain(EXPLAIN_2)
+        self.assertEqual(info['stages'], ['SORT', 'COLLSCAN'])
+        self.assertEqual((info['keys_examined'], info['docs_examined'],
+            info['returned'], info['time']), (0, 100, 5, 7))
+
+    def test_legacy_output_with_index(self):
+        info = normalize_explain({'cursor': 'BtreeCursor status_1',
+            'nscanned': 5, 'nscannedObjects': 5, 'n': 5, 'millis': 0})
+        self.assertEqual(info['winning_plan'], {'stage': 'IXSCAN',
+            'indexName': 'status_1'})
+        self.assertEqual(info['keys_examined'], 5)
+
+    def test_queryset_explain(self):
+        queryset = QuerySet(Item).filter(status='new')
+        with patch.object(QuerySet, 'collection') as collection:
+            collection.find.return_value.explain.return_value = EXPLAIN_2
+            self.assertEqual(queryset.explain()['stages'],
+                ['SORT', 'COLLSCAN'])
+            collection.find.assert_called_once_with({'status': 'new'},
+                fields=None)
+
+
+class TestSuggestIndex(TestCase):
+
+    def test_equality_sort_range(self):
+        index = suggest_index({'status': 'new', 'price': {'$gte': 10},
+            'name': re.compile('^A'), 'country': {'$in': ['PL', 'DE']}},
+            [('created', -1)])
+        self.assertEqual(index, Index([('country', 1), ('status', 1),
+            ('created', -1), ('name', 1), ('price', 1)]))
+
+    def test_sort_field_filtered_by_range(self):
+        self.assertEqual(suggest_index({'price': {'$gt': 1}}, [('price', -1)]),
+            Index([('price', -1)]))
+
+    def test_logical_operators_are_skipped(self):
+        self.assertEqual(suggest_index({'$or': [{'a': 1}], 'b': 1}),
+            Index('b'))
+
+
+class TestSlowQueryDetection(TestCase):
+
+    def get_cursor(self, raw):
+        collection = MagicMock()
+        collection.find.return_value.explain.return_value = raw
+        instrumented = InstrumentedCollection(collection, Item,
+            connections['mongodb'])
+        return instrumented.find({'status': 'new', 'price': {'$lt': 5}})
+
+    def iterate(self, cursor):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            list(cursor)
+        return caught
+
+    @override_settings(MONGODB_SLOW_QUERY_MS=0)
+    def test_collection_scan_is_reported(self):
+        cursor = self.get_cursor(EXPLAIN_2).sort([('created', -1)])
+        caught = self.iterate(cursor)
+        self.assertEqual(len(caught), 1)
+        self.assertIs(caught[0].category, SlowQueryWarning)
+        message = str(caught[0].message)
+        self.assertIn('COLLSCAN, SORT', message)
+        self.assertIn("Index([('status', 1), ('created', -1), ('price', 1)]) "
+            "to Item.Meta.indexes", message)
+
+    @override_settings(MONGODB_SLOW_QUERY_MS=0)
+    def test_indexed_query_is_not_reported(self):
+        raw = {'queryPlanner': {'winningPlan': {'stage': 'IXSCAN'}}}
+        self.assertEqual(self.iterate(self.get_cursor(raw)), [])
+
+    @override_settings(MONGODB_SLOW_QUERY_MS=1000)
+    def test_fast_query_is_not_explained(self):
+        cursor = self.get_cursor(EXPLAIN_2)
+        self.assertEqual(self.iterate(cursor), [])
+        self.assertFalse(cursor.cursor.explain.called)
+
+    @override_settings(MONGODB_SLOW_QUERY_MS=0)
+    def test_only_exhausted_queries_are_explained(self):
+        cursor = self.get_cursor(EXPLAIN_2)
+        cursor.cursor.__iter__.return_value = iter([{}, {}])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            cursor.next()
+            cursor.close()
+        self.assertEqual(caught, [])
+
+        def fail():
+            yield {}
+            raise ValueError()
+
+        cursor = self.get_cursor(EXPLAIN_2)
+        cursor.cursor.__iter__.return_value = fail()
+        with self.assertRaises(ValueError):
+            self.iterate(cursor)
+        self.assertFalse(cursor.cursor.explain.called)
+
+    @override_settings(MONGODB_SLOW_QUERY_MS=0)
+    def test_collections_are_instrumented(self):
+        self.assertIsInstance(Item.objects.collection, InstrumentedCollection)
@@ -0,0 +1,97 @@
+from django.http import HttpRequest
+from djmongo.document import Document
+from djmongo.identitymap import get_identity_map
+from djmongo.identitymap import identity_map
+from djmongo.middleware import IdentityMapMiddleware
+from djmongo.querysets import QuerySet
+from djmongo.test import TestCase
+from mock import Mock
+from mock import patch
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestIdentityMap(TestCase):
+
+    def setUp(self):
+        self.item = Item.objects.create(data={'title': 'Slayer'})
+        self.another = Item.objects.create(data={'title': 'Metallica'})
+
+    def test_context_manager(self):
+        self.assertIsNone(get_identity_map())
+        with identity_map() as identities:
+            self.assertIs(get_identity_map(), identities)
+            with identity_map() as nested:
+                self.assertIs(get_identity_map(), nested)
+            self.assertIs(get_identity_map(), identities)
+        self.assertIsNone(get_identity_map())
+
+    def test_get_without_identity_map(self):
+        self.assertIsNot(Item.objects.get(_id=self.item.id),
+            Item.objects.get(_id=self.item.id))
+
+    def test_get(self):
+        with identity_map():
+            item = Item.objects.get(_id=self.item.id)
+            with patch.object(QuerySet, 'get') as get:
+                self.assertIs(Item.objects.get(_id=self.item.id), item)
+                self.assertFalse(get.called)
+            self.assertIsNot(Item.objects.get(title='Slayer'), item)
+
+    def test_get_missing_document(self):
+        with identity_map():
+            Item.objects.get(_id=self.item.id).delete()
+            with self.assertRaises(Item.DoesNotExist):
+                Item.objects.get(_id=self.item.id)
+
+    def test_in_bulk(self):
+        self.assertEqual(Item.objects.in_bulk([self.item.id, self.another.id,
+            'missing']), {self.item.id: self.item,
+            self.another.id: self.another})
+        with identity_map():
+            item = Item.objects.get(_id=self.item.id)
+            with patch.object(QuerySet, 'filter') as filter:
+                filter.return_value = []
+                result = Item.objects.in_bulk([self.item.id, self.another.id])
+                filter.assert_called_once_with(_id__in=[self.another.id])
+            self.assertIs(result[self.item.id], item)
+            another = Item.objects.in_bulk([self.another.id])[self.another.id]
+            self.assertIs(Item.objects.get(_id=self.another.id), another)
+
+    def test_saved_documents_are_kept(self):
+        with identity_map():
+            item = Item.objects.create(data={'title': 'Sepultura'})
+            self.assertIs(Item.objects.get(_id=item.id), item)
+
+    def test_queryset_writes_clear_collection(self):
+        with identity_map() as identities:
+            Item.objects.get(_id=self.item.id)
+            Item.objects.filter(title='Slayer').update(title='Slayer!')
+            self.assertIsNone(identities.get(Item, self.item.id))
+            self.assertEqual(Item.objects.get(_id=self.item.id).data['title'],
+                'Slayer!')
+
+
+class TestIdentityMapMiddleware(TestCase):
+
+    def test_identity_map_is_active_during_request(self):
+        middleware = IdentityMapMiddleware()
+        request = HttpRequest()
+        middleware.process_request(request)
+        self.assertIsNotNone(get_identity_map())
+        response = Mock()
+        self.assertIs(middleware.process_response(request, response),
+            response)
+        self.assertIsNone(get_identity_map())
+
+    def test_exception(self):
+        middleware = IdentityMapMiddleware()
+        request = HttpRequest()
+        middleware.process_request(request)
+        middleware.process_exception(request, ValueError())
+        self.assertIsNone(get_identity_map())
+        middleware.process_response(request, Mock())
+        self.assertIsNone(get_identity_map())
@@ -0,0 +1,137 @@
+from django.db import connections
+from djmongo.compat import override_settings
+from djmongo.document import Document
+from djmongo.instrumentation import InstrumentedCollection
+from djmongo.instrumentation import InstrumentedCursor
+from djmongo.instrumentation import get_shape
+from djmongo.instrumentation import get_size
+from djmongo.signals import query_executed
+from djmongo.test import TestCase
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestGetShape(TestCase):
+
+    def test_values_are_replaced(self):
+        self.assertEqual(get_shape({'age': {'$gte': 18, '$lt': 65},
+            'author.name': 'Joe', 'tags': {'$in': ['a', 'b']}}),
+            {'age': {'$gte': '?', '$lt': '?'}, 'author.name': '?',
+             'tags': {'$in': '?'}})
+
+    def test_nested_clauses(self):
+        self.assertEqual(get_shape({'$or': [{'a': 1}, {'b': {'$gt': 2}}]}),
+            {'$or': [{'a': '?'}, {'b': {'$gt': '?'}}]})
+
+    def test_empty(self):
+        self.assertEqual(get_shape({}), {})
+        self.assertEqual(get_shape(None), '?')
+
+
+class TestInstrumentation(TestCase):
+
+    def setUp(self):
+        self.connection = connections['mongodb']
+        self.connection.queries = []
+        self.executed = []
+        query_executed.connect(self.receiver)
+        self.addCleanup(query_executed.disconnect, self.receiver)
+
+    def receiver(self, sender, **kwargs):
+        kwargs.pop('signal')
+        kwargs['sender'] = sender
+        self.executed.append(kwargs)
+
+    def test_collection_is_not_instrumented_by_default(self):
+        query_executed.disconnect(self.receiver)
+        self.assertNotIsInstance(Item.objects.collection,
+            InstrumentedCollection)
+
+    def test_find(self):
+        for x in range(3):
+            Item.objects.create(data={'number': x})
+        del self.executed[:]
+        items = list(Item.objects.filter(number__gte=1))
+        self.assertEqual(len(items), 2)
+        self.assertEqual(len(self.executed), 1)
+        executed = self.executed[0]
+        self.assertGreaterEqual(executed.pop('duration'), 0)
+        self.assertEqual(executed, {
+            'sender': Item,
+            'using': 'mongodb',
+            'operation': 'find',
+            'collection': Item._meta.collection_name,
+            'filter': {'number': {'$gte': '?'}},
+            'documents': 2,
+            'bytes': None,
+        })
+
+    @override_settings(MONGODB_INSTRUMENT_BYTES=True)
+    def test_bytes_are_counted_if_enabled(self):
+        item = Item.objects.create(data={'number': 1})
+        self.assertEqual(self.executed[-1]['bytes'], get_size(item.data))
+        list(Item.objects.filter(number=1))
+        self.assertEqual(self.executed[-1]['bytes'], get_size(item.data))
+
+    def test_next_and_getitem_are_recorded(self):
+        for x in range(3):
+            Item.objects.create(data={'number': x})
+        del self.executed[:]
+        cursor = Item.objects.collection.find({}).sort('number')
+        self.assertEqual(cursor.next()['number'], 0)
+        cursor.close()
+        self.assertEqual(Item.objects.collection.find({}).sort('number')[2][
+            'number'], 2)
+        self.assertEqual([(executed['operation'], executed['documents'])
+            for executed in self.executed], [('find', 1), ('find', 1)])
+
+    def test_cursor_methods_are_chained(self):
+        cursor = Item.objects.collection.find({})
+        self.assertIsInstance(cursor, InstrumentedCursor)
+        self.assertIs(cursor.sort('number').limit(1), cursor)
+
+    def test_abandoned_cursor_is_recorded(self):
+        for x in range(3):
+            Item.objects.create(data={'number': x})
+        del self.executed[:]
+        self.assertTrue(Item.objects.exists())
+        self.assertEqual([(executed['operation'], executed['documents'])
+            for executed in self.executed], [('find', 1)])
+
+    def test_writes(self):
+        item = Item.objects.create(data={'number': 1})
+        item.data['number'] = 2
+        item.save()
+        Item.objects.filter(number=2).delete()
+        self.assertEqual([(executed['operation'], executed['filter'],
+            executed['documents']) for executed in self.executed], [
+            ('insert', '?', 1),
+            ('update', {'_id': '?'}, 1),
+            ('remove', {'number': '?'}, 1),
+        ])
+
+    def test_count(self):
+        Item.objects.create(data={'number': 1})
+        self.assertEqual(Item.objects.filter(number=1).count(), 1)
+        self.assertEqual(self.executed[-1]['operation'], 'count')
+        self.assertEqual(self.executed[-1]['filter'], {'number': '?'})
+
+    def test_queries_are_not_logged_without_debug(self):
+        Item.objects.create(data={'number': 1})
+        self.assertEqual(self.connection.queries, [])
+
+    @override_settings(DEBUG=True)
+    def test_queries_are_logged_with_debug(self):
+        query_executed.disconnect(self.receiver)
+        Item.objects.create(data={'number': 1})
+        list(Item.objects.filter(number=1))
+        self.assertEqual(len(self.connection.queries), 2)
+        query = self.connection.queries[1]
+        self.assertEqual(query['sql'], "%s.find({'number': 1})" %
+            Item._meta.collection_name)
+        self.assertEqual(query['operation'], 'find')
+        self.assertEqual(query['documents'], 1)
+        self.assertIn('time', query)
@@ -0,0 +1,117 @@
+from djmongo.lookups import compile_filters
+from djmongo.lookups import compile_update
+from djmongo.lookups import get_plan
+from djmongo.lookups import parse_lookup
+from djmongo.test import TestCase
+import re
+
+
+class TestParseLookup(TestCase):
+
+    def test_exact(self):
+        self.assertEqual(parse_lookup('title'), ('title', 'exact'))
+        self.assertEqual(parse_lookup('title__exact'), ('title', 'exact'))
+
+    def test_operator(self):
+        self.assertEqual(parse_lookup('age__gte'), ('age', 'gte'))
+
+    def test_dotted_path(self):
+        self.assertEqual(parse_lookup('author__name'), ('author.name', 'exact'))
+        self.assertEqual(parse_lookup('author__stats__age__lt'),
+            ('author.stats.age', 'lt'))
+
+
+class TestGetPlan(TestCase):
+
+    def test_plan_is_cached_by_shape(self):
+        plan = get_plan({'age__gte': 1, 'title': 'foo'})
+        self.assertEqual(plan, [('age__gte', 'age', 'gte'),
+            ('title', 'title', 'exact')])
+        self.assertIs(get_plan({'title': 'bar', 'age__gte': 2}), plan)
+
+
+class TestCompileFilters(TestCase):
+
+    def test_exact(self):
+        self.assertEqual(compile_filters({'title': 'foo', 'tags': ['a']}),
+            {'title': 'foo', 'tags': ['a']})
+
+    def test_range_is_merged(self):
+        self.assertEqual(compile_filters({'age__gte': 18, 'age__lt': 65}),
+            {'age': {'$gte': 18, '$lt': 65}})
+
+    def test_operators(self):
+        self.assertEqual(compile_filters({
+            'a__ne': 1,
+            'b__in': set([2]),
+            'c__nin': (3, 4),
+            'd__all': ['x', 'y'],
+            'e__size': '2',
+            'f__exists': 0,
+        }), {
+            'a': {'$ne': 1},
+            'b': {'$in': [2]},
+            'c': {'$nin': [3, 4]},
+            'd': {'$all': ['x', 'y']},
+            'e': {'$size': 2},
+            'f': {'$exists': False},
+        })
+
+    def test_elem_match(self):
+        self.assertEqual(compile_filters({
+            'scores__elem_match': {'name': 'math', 'value__gt': 5}}),
+            {'scores': {'$elemMatch': {'name': 'math', 'value': {'$gt': 5}}}})
+
+    def test_dotted_paths(self):
+        self.assertEqual(compile_filters({'author__name': 'Joe',
+            'author__age__gt': 20}),
+            {'author.name': 'Joe', 'author.age': {'$gt': 20}})
+
+    def test_startswith_is_anchored_and_escaped(self):
+        pattern = compile_filters({'title__startswith': 'a.b'})['title']['$regex']
+        self.assertEqual(pattern.pattern, '^a\\.b')
+        self.assertFalse(pattern.flags & re.IGNORECASE)
+
+        pattern = compile_filters({'title__istartswith': 'ab'})['title']['$regex']
+        self.assertEqual(pattern.pattern, '^ab')
+        self.assertTrue(pattern.flags & re.IGNORECASE)
+
+    def test_regex_can_be_merged_with_other_lookups(self):
+        query = compile_filters({'title__startswith': 'ab', 'title__ne': 'abc'})
+        self.assertEqual(sorted(query['title'].keys()), ['$ne', '$regex'])
+
+    def test_exact_cannot_be_combined(self):
+        with self.assertRaises(ValueError):
+            compile_filters({'age': 1, 'age__gt': 0})
+
+    def test_conflicting_lookups(self):
+        with self.assertRaises(ValueError):
+            compile_filters({'title__startswith': 'a', 'title__contains': 'b'})
+
+
+class TestCompileUpdate(TestCase):
+
+    def test_plain_keys_are_set(self):
+        self.assertEqual(compile_update({'title': 'foo', 'a__b': 1}),
+            {'$set': {'title': 'foo', 'a__b': 1}})
+
+    def test_operators(self):
+        self.assertEqual(compile_update({
+            'set__title': 'foo',
+            'inc__stats__views': 1,
+            'push__tags': 'a',
+            'pull__tags': 'b',
+            'add_to_set__labels': 'c',
+            'unset__obsolete': True,
+            'min__low': 1,
+            'max__high': 10,
+        }), {
+            '$set': {'title': 'foo'},
+            '$inc': {'stats.views': 1},
+            '$push': {'tags': 'a'},
+            '$pull': {'tags': 'b'},
+            '$addToSet': {'labels': 'c'},
+            '$unset': {'obsolete': 1},
+            '$min': {'low': 1},
+            '$max': {'high': 10},
+        })
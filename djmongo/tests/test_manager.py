@@ -4,7 +4,9 @@ from django.core.exceptions import ImproperlyConfigured
 from djmongo.test import TestCase
 from djmongo.document import Document
 from djmongo.document import Manager
+from djmongo.exceptions import BulkCreateError
 from djmongo.exceptions import MultipleItemsReturnedError
+import pymongo
 
 
 class Item(Document):
@@ -116,6 +118,205 @@ class TestManager(TestCase):
         }, result)
         self.assertItemsEqual(Item.objects.pluck('foo'), ['bar' for x in range(10)])
 
+    def test_bulk_create(self):
+        items = [Item(data={'id': x}) for x in range(10)]
+        result = Item.objects.bulk_create(items, batch_size=3)
+        self.assertEqual(result, items)
+        self.assertTrue(all(item.id is not None for item in items))
+        self.assertItemsEqual(Item.objects.pluck('_id'),
+            [item.id for item in items])
+
+    def test_bulk_create_batches(self):
+        items = [Item(data={'id': x}) for x in range(10)]
+        batches = list(Item.objects._get_insert_batches(items, batch_size=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual(sum(batches, []), items)
+
+    def test_bulk_create_reports_failed_batches(self):
+        items = [Item(data={'id': x}) for x in range(4)]
+        results = [pymongo.errors.OperationFailure('duplicate key'),
+            ['id2', 'id3']]
+
+        def insert(data, **kwargs):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        collection = Mock()
+        collection.insert.side_effect = insert
+        collection.find.return_value = []
+        with patch.object(Manager, 'collection', collection):
+            with self.assertRaises(BulkCreateError) as context:
+                Item.objects.bulk_create(items, batch_size=2)
+        self.assertEqual(collection.insert.call_count, 2)
+        self.assertEqual(len(context.exception.errors), 1)
+        self.assertEqual(context.exception.errors[0][0], items[:2])
+        self.assertEqual([item.id for item in items[2:]], ['id2', 'id3'])
+
+    def test_bulk_create_reports_failed_documents(self):
+        existing = Item.objects.create(data={'id': 1})
+        items = [Item(data={'id': 0}), Item(data={'_id': existing.id}),
+            Item(data={'id': 2})]
+        with self.assertRaises(BulkCreateError) as context:
+            Item.objects.bulk_create(items, ordered=True)
+        self.assertEqual(context.exception.errors[0][0], items[1:])
+        self.assertIsNotNone(items[0].id)
+        self.assertIsNone(items[2].id)
+        self.assertEqual(Item.objects.count(), 2)
+
+    def test_insert_many(self):
+        items = Item.objects.insert_many([{'id': 1}, {'id': 2}])
+        self.assertTrue(all(isinstance(item, Item) for item in items))
+        self.assertItemsEqual(Item.objects.pluck('id'), [1, 2])
+
+    def test_find_and_modify(self):
+        Item.objects.create(data={'id': 1, 'status': 'new', 'counter': 1})
+        Item.objects.create(data={'id': 2, 'status': 'new', 'counter': 1})
+
+        item = Item.objects.find_and_modify({'status': 'new'},
+            {'set__status': 'taken', 'inc__counter': 1}, sort=['-id'])
+        self.assertEqual(item.data['id'], 2)
+        self.assertEqual(item.data['status'], 'taken')
+        self.assertEqual(item.data['counter'], 2)
+        self.assertEqual(Item.objects.get(id=2).data['status'], 'taken')
+
+        item = Item.objects.find_and_modify({'status': 'new'},
+            {'$set': {'status': 'taken'}}, new=False, fields=['status'])
+        self.assertEqual(item.data, {'_id': item.id, 'status': 'new'})
+
+        self.assertIsNone(Item.objects.find_and_modify({'status': 'new'},
+            {'set__status': 'taken'}))
+
+    def test_find_and_modify_compiles_arguments(self):
+        with patch.object(Manager, 'collection') as collection:
+            collection.find_and_modify.return_value = {'value': None}
+            Item.objects.find_and_modify({'counter__gte': 1},
+                {'inc__counter': 1}, sort=['-counter'], fields=['counter'])
+            collection.find_and_modify.assert_called_once_with(
+                {'counter': {'$gte': 1}}, {'$inc': {'counter': 1}},
+                full_response=True, new=True, upsert=False,
+                sort=[('counter', pymongo.DESCENDING)],
+                fields={'counter': True})
+
+    def test_get_or_create(self):
+        item, created = Item.objects.get_or_create(slug='slayer',
+            defaults={'title': 'Slayer'})
+        self.assertTrue(created)
+        self.assertEqual(item.data['slug'], 'slayer')
+        self.assertEqual(item.data['title'], 'Slayer')
+
+        same, created = Item.objects.get_or_create(slug='slayer',
+            defaults={'title': 'Other'})
+        self.assertFalse(created)
+        self.assertEqual(same.id, item.id)
+        self.assertEqual(same.data['title'], 'Slayer')
+        self.assertEqual(Item.objects.count(), 1)
+
+    def test_get_or_create_without_defaults(self):
+        item, created = Item.objects.get_or_create(slug='slayer')
+        self.assertTrue(created)
+        self.assertEqual(Item.objects.get(slug='slayer').id, item.id)
+
+    def test_update_or_create(self):
+        item, created = Item.objects.update_or_create(slug='slayer',
+            defaults={'title': 'Slayer'})
+        self.assertTrue(created)
+
+        item, created = Item.objects.update_or_create(slug='slayer',
+            defaults={'title': 'Slayer!'})
+        self.assertFalse(created)
+        self.assertEqual(item.data['title'], 'Slayer!')
+        self.assertEqual(Item.objects.count(), 1)
+
+    def test_in_bulk(self):
+        items = [Item.objects.create(data={'id': x, 'title': str(x)})
+            for x in range(5)]
+        ids = [item.id for item in items]
+        result = Item.objects.in_bulk(ids[:3] + ids[:1] + ['missing'])
+        self.assertEqual(sorted(result.keys()), sorted(ids[:3]))
+        self.assertEqual(result[ids[1]].data, items[1].data)
+
+    def test_in_bulk_batches(self):
+        ids = [Item.objects.create(data={'id': x}).id for x in range(5)]
+        with patch.object(Manager, 'in_bulk_batch_size', 2):
+            with patch('djmongo.querysets.QuerySet.filter') as filter:
+                filter.return_value = []
+                Item.objects.in_bulk(ids)
+                self.assertEqual([call[1]['_id__in'] for call in
+                    filter.call_args_list], [ids[:2], ids[2:4], ids[4:]])
+            self.assertEqual(len(Item.objects.in_bulk(ids)), 5)
+
+    def test_in_bulk_fields(self):
+        item = Item.objects.create(data={'id': 1, 'title': 'Slayer'})
+        self.assertEqual(Item.objects.in_bulk([item.id], fields=['id'])[
+            item.id].data, {'_id': item.id, 'id': 1})
+
+
+class Payment(Document):
+    class Meta:
+        using = 'mongodb'
+        write_concern = {'w': 'majority', 'j': True, 'wtimeout': 5000}
+
+
+class TestWriteConcern(TestCase):
+
+    def test_get_write_options(self):
+        self.assertEqual(Item.objects.get_write_options(), {'safe': True})
+        self.assertEqual(Item.objects.get_write_options(safe=False), {'w': 0})
+        self.assertEqual(Payment.objects.get_write_options(),
+            {'w': 'majority', 'j': True, 'wtimeout': 5000})
+        self.assertEqual(Payment.objects.get_write_options(safe=False),
+            {'w': 0})
+        self.assertEqual(Payment.objects.get_write_options(
+            write_concern={'w': 1, 'j': False}), {'w': 1, 'j': False})
+
+    @patch.object(Manager, 'collection')
+    def test_meta_write_concern_is_used(self, collection):
+        payment = Payment(data={'amount': 10})
+        payment.save()
+        self.assertEqual(collection.insert.call_args[1],
+            {'w': 'majority', 'j': True, 'wtimeout': 5000})
+        Payment.objects.filter(amount=10).update(inc__amount=1)
+        collection.update.assert_called_once_with({'amount': 10},
+            {'$inc': {'amount': 1}}, upsert=False, multi=True, w='majority',
+            j=True, wtimeout=5000)
+
+    @patch.object(Manager, 'collection')
+    def test_write_concern_override(self, collection):
+        Payment.objects.bulk_create([Payment()], write_concern={'w': 0})
+        self.assertEqual(collection.insert.call_args[1],
+            {'continue_on_error': True, 'w': 0})
+        Payment.objects.filter(amount=10).delete(write_concern={'w': 2})
+        collection.remove.assert_called_once_with({'amount': 10}, w=2)
+
+    @patch.object(Manager, 'collection')
+    def test_find_and_modify_write_concern(self, collection):
+        collection.find_and_modify.return_value = {'value': None}
+        Item.objects.find_and_modify({'id': 1}, {'inc__counter': 1})
+        self.assertNotIn('writeConcern',
+            collection.find_and_modify.call_args[1])
+        Payment.objects.get_or_create(id=1)
+        self.assertEqual(collection.find_and_modify.call_args[1][
+            'writeConcern'], {'w': 'majority', 'j': True, 'wtimeout': 5000})
+        Payment.objects.update_or_create(id=1, defaults={'amount': 1},
+            write_concern={'w': 2})
+        self.assertEqual(collection.find_and_modify.call_args[1][
+            'writeConcern'], {'w': 2})
+
+    @patch.object(Manager, 'collection')
+    def test_create_write_concern(self, collection):
+        Payment.objects.create(data={'amount': 10}, write_concern={'w': 0})
+        self.assertEqual(collection.insert.call_args[1], {'w': 0})
+
+    def test_unacknowledged_writes(self):
+        item = Item.objects.create(data={'title': 'Slayer'})
+        item.data['title'] = 'Slayer!'
+        item.save(write_concern={'w': 0})
+        Item.objects.filter(title='Slayer!').update_raw({'foo': 'bar'},
+            safe=False)
+        self.assertEqual(Item.objects.get(title='Slayer!').data['foo'], 'bar')
+
 
 class CustomManager(Manager):
 
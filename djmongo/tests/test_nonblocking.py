@@ -0,0 +1,227 @@
+from djmongo.compat import unittest
+from djmongo.document import Document
+from djmongo.exceptions import BulkCreateError
+from djmongo.exceptions import DjongoError
+from djmongo.exceptions import MultipleItemsReturnedError
+from djmongo.identitymap import identity_map
+from djmongo.querycache import get_query_cache
+from djmongo.signals import query_executed
+from djmongo.test import TestCase
+from mock import Mock
+from mock import patch
+import pymongo
+
+try:
+    from tornado import gen
+    from tornado.ioloop import IOLoop
+    from djmongo.nonblocking import AsyncManager
+    from djmongo.nonblocking import AsyncQuerySet
+    from djmongo.nonblocking import InProcessCollection
+    from djmongo.nonblocking import InstrumentedAsyncCollection
+    from djmongo.nonblocking import get_collection
+except ImportError:
+    IOLoop = None
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+        query_cache = True
+
+
+class SecondaryItem(Document):
+    class Meta:
+        using = 'mongodb'
+        read_preference = 'secondary'
+
+
+@unittest.skipIf(IOLoop is None, "Tornado is not installed")
+class TestAsyncManager(TestCase):
+
+    def setUp(self):
+        self.items = AsyncManager(Item,
+            collection=InProcessCollection(Item.objects.collection))
+        for x in range(5):
+            Item.objects.create(data={'number': x, 'even': x % 2 == 0})
+
+    def run_sync(self, func, *args, **kwargs):
+        return IOLoop.current().run_sync(lambda: func(*args, **kwargs))
+
+    def test_filters_are_compiled(self):
+        queryset = self.items.filter(number__gte=3).order_by('-number')
+        self.assertIsInstance(queryset, AsyncQuerySet)
+        self.assertEqual(queryset.get_filters(), {'number': {'$gte': 3}})
+        items = self.run_sync(queryset.ato_list)
+        self.assertEqual([item.data['number'] for item in items], [4, 3])
+
+    def test_iteration_is_not_allowed(self):
+        with self.assertRaises(TypeError):
+            list(self.items.all())
+
+    def test_blocking_methods_are_not_allowed(self):
+        queryset = self.items.filter(even=True)
+        for name, args in [('count', ()), ('__len__', ()),
+                           ('__nonzero__', ()), ('get', ()), ('first', ()),
+                           ('exists', ()), ('update', ()), ('delete', ()),
+                           ('pluck', ('number',)), ('distinct', ('number',)),
+                           ('aggregate', ()), ('explain', ())]:
+            with self.assertRaises(TypeError):
+                getattr(queryset, name)(*args)
+        with self.assertRaises(TypeError) as context:
+            len(queryset)
+        self.assertIn('acount()', str(context.exception))
+        self.assertEqual(Item.objects.count(), 5)
+
+    def test_acount(self):
+        self.assertEqual(self.run_sync(self.items.acount), 5)
+        self.assertEqual(self.run_sync(self.items.acount, even=True), 3)
+
+    def test_aget(self):
+        item = self.run_sync(self.items.aget, number=2)
+        self.assertEqual(item.id, Item.objects.get(number=2).id)
+        with self.assertRaises(Item.DoesNotExist):
+            self.run_sync(self.items.aget, number=10)
+        with self.assertRaises(MultipleItemsReturnedError):
+            self.run_sync(self.items.aget, even=True)
+
+    def test_alast(self):
+        last = self.run_sync(self.items.filter(even=False).alast)
+        self.assertEqual(last.data['number'], 3)
+        last = self.run_sync(self.items.all().order_by('-number')[:2].alast)
+        self.assertEqual(last.data['number'], 3)
+        with self.assertRaises(TypeError) as context:
+            self.items.all().last()
+        self.assertIn('alast()', str(context.exception))
+
+    def test_afirst_and_aexists(self):
+        first = self.run_sync(self.items.filter(even=False).afirst)
+        self.assertEqual(first.data['number'], 1)
+        self.assertTrue(self.run_sync(self.items.aexists, number=1))
+        self.assertFalse(self.run_sync(self.items.aexists, number=10))
+
+    def test_asave(self):
+        @gen.coroutine
+        def create_and_update():
+            item = yield self.items.acreate(data={'number': 10})
+            item.data['number'] = 11
+            yield self.items.asave(item)
+            raise gen.Return(item)
+        item = self.run_sync(create_and_update)
+        self.assertEqual(Item.objects.get(_id=item.id).data, {
+            '_id': item.id, 'number': 11})
+        self.assertEqual(item.get_changes(), ({}, {}))
+
+    def test_writes_invalidate_cached_results(self):
+        get_query_cache().clear()
+        queryset = Item.objects.all().cache()
+        self.assertEqual(queryset.count(), 5)
+        self.run_sync(self.items.acreate, data={'number': 10})
+        self.assertEqual(queryset.count(), 6)
+
+    def test_aupdate_and_adelete(self):
+        self.run_sync(self.items.filter(even=True).aupdate, inc__number=10)
+        self.assertEqual(sorted(Item.objects.pluck('number')),
+            [1, 3, 10, 12, 14])
+        self.run_sync(self.items.filter(number__gte=10).adelete)
+        self.assertEqual(Item.objects.count(), 2)
+        item = Item.objects.get(number=1)
+        self.run_sync(self.items.adelete, item)
+        self.assertEqual(Item.objects.count(), 1)
+
+    def test_sliced_aupdate(self):
+        with self.assertRaises(TypeError):
+            self.run_sync(self.items.all()[:2].aupdate, number=10)
+        self.assertEqual(Item.objects.filter(number=10).count(), 0)
+
+    def test_writes_update_identity_map(self):
+        item = Item.objects.get(number=1)
+        with identity_map() as identities:
+            Item.objects.get(_id=item.id)
+            self.run_sync(self.items.filter(number=1).aupdate,
+                set__number=10)
+            self.assertIsNone(identities.get(Item, item.id))
+            self.assertEqual(Item.objects.get(_id=item.id).data['number'],
+                10)
+            created = self.run_sync(self.items.acreate, data={'number': 20})
+            self.assertIs(identities.get(Item, created.id), created)
+            self.run_sync(self.items.adelete, created)
+            self.assertIsNone(identities.get(Item, created.id))
+
+    def test_adelete_unsaved_document(self):
+        with self.assertRaises(DjongoError):
+            self.run_sync(self.items.adelete, Item(data={'number': 10}))
+
+    def test_abulk_create(self):
+        documents = [Item(data={'number': x}) for x in range(10, 15)]
+        result = self.run_sync(self.items.abulk_create, documents,
+            batch_size=2)
+        self.assertEqual(result, documents)
+        self.assertTrue(all(document.id for document in documents))
+        self.assertEqual(Item.objects.count(), 10)
+
+    def test_abulk_create_errors(self):
+        existing = Item.objects.get(number=0)
+        documents = [Item(data={'_id': existing.id}), Item(data={'n': 1})]
+        with self.assertRaises(BulkCreateError) as context:
+            self.run_sync(self.items.abulk_create, documents, batch_size=1)
+        self.assertEqual(len(context.exception.errors), 1)
+        self.assertIsNotNone(documents[1].id)
+
+
+@unittest.skipIf(IOLoop is None, "Tornado is not installed")
+class TestGetCollection(TestCase):
+
+    def setUp(self):
+        self.connection = Item.objects.connection
+        self.collection = Item.objects.db[Item._meta.collection_name]
+        client = {self.connection.settings_dict['NAME']: {
+            Item._meta.collection_name: InProcessCollection(self.collection),
+            SecondaryItem._meta.collection_name: Mock(),
+        }}
+        patcher = patch('djmongo.nonblocking.get_client')
+        patcher.start().return_value = client
+        self.addCleanup(patcher.stop)
+        self.executed = []
+        self.items = AsyncManager(Item)
+
+    def receiver(self, sender, **kwargs):
+        self.executed.append((kwargs['operation'], kwargs['filter'],
+            kwargs['documents']))
+
+    def run_sync(self, func, *args, **kwargs):
+        return IOLoop.current().run_sync(lambda: func(*args, **kwargs))
+
+    def test_document_api(self):
+        self.assertIsInstance(Item.aobjects, AsyncManager)
+        self.assertIs(Item.aobjects.document, Item)
+        item = Item(data={'number': 1})
+        self.run_sync(item.asave)
+        self.assertEqual(self.run_sync(Item.aobjects.aget, _id=item.id), item)
+        self.run_sync(item.adelete)
+        self.assertIsNone(item.id)
+        self.assertEqual(Item.objects.count(), 0)
+
+    def test_read_preference(self):
+        self.assertEqual(get_collection(SecondaryItem).read_preference,
+            pymongo.ReadPreference.SECONDARY)
+
+    def test_collection_is_not_instrumented_by_default(self):
+        self.assertNotIsInstance(get_collection(Item),
+            InstrumentedAsyncCollection)
+
+    def test_operations_are_instrumented(self):
+        query_executed.connect(self.receiver)
+        self.addCleanup(query_executed.disconnect, self.receiver)
+        self.assertIsInstance(get_collection(Item),
+            InstrumentedAsyncCollection)
+        item = self.run_sync(self.items.acreate, data={'number': 1})
+        self.assertEqual(len(self.run_sync(
+            self.items.filter(number=1).order_by('number').ato_list)), 1)
+        self.assertEqual(self.run_sync(self.items.acount, number=1), 1)
+        self.run_sync(self.items.adelete, item)
+        self.assertEqual(self.executed, [
+            ('insert', '?', 1),
+            ('find', {'number': '?'}, 1),
+            ('count', {'number': '?'}, 0),
+            ('remove', {'_id': '?'}, 1),
+        ])
@@ -0,0 +1,160 @@
+from bson import ObjectId
+from datetime import datetime
+from djmongo.backend.mongodb.base import shared_connections
+from djmongo.document import Document
+from djmongo.parallel import _init_worker
+from djmongo.parallel import _map_chunk
+from djmongo.parallel import get_range_query
+from djmongo.parallel import get_ranges
+from djmongo.parallel import get_split_points
+from djmongo.test import TestCase
+from multiprocessing.pool import MaybeEncodingError
+import cPickle
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+def get_number(item):
+    return item.data['number']
+
+
+def get_callback(item):
+    return lambda: item
+
+
+def fail(item):
+    raise ValueError(item.data['number'])
+
+
+class TestRanges(TestCase):
+
+    def test_split_numbers(self):
+        self.assertEqual(get_split_points(0, 100, 4), [25, 50, 75])
+        self.assertEqual(get_split_points(0, 2, 4), [1])
+        self.assertEqual(get_split_points(0.0, 1.0, 2), [0.5])
+        self.assertEqual(get_split_points(5, 5, 4), [])
+
+    def test_split_object_ids(self):
+        lowest = ObjectId.from_datetime(datetime(2014, 1, 1))
+        highest = ObjectId.from_datetime(datetime(2014, 1, 5))
+        points = get_split_points(lowest, highest, 4)
+        self.assertEqual([point.generation_time.day for point in points],
+            [2, 3, 4])
+
+    def test_other_values_are_not_split(self):
+        self.assertEqual(get_split_points('a', 'z', 4), [])
+        self.assertEqual(get_split_points(1, ObjectId(), 4), [])
+
+    def test_get_ranges(self):
+        self.assertEqual(get_ranges([]), [(None, None)])
+        self.assertEqual(get_ranges([1, 2]), [(None, 1), (1, 2), (2, None)])
+
+    def test_get_range_query(self):
+        self.assertEqual(get_range_query({'a': 1}, None, None), {'a': 1})
+        self.assertEqual(get_range_query({'a': 1}, 1, None),
+            {'a': 1, '_id': {'$gte': 1}})
+        self.assertEqual(get_range_query({'_id': {'$ne': 3}}, None, 5),
+            {'$and': [{'_id': {'$ne': 3}}, {'_id': {'$lt': 5}}]})
+
+
+class TestParallelScan(TestCase):
+
+    def setUp(self):
+        Item.objects.insert_many({'_id': x, 'number': x, 'even': x % 2 == 0}
+            for x in range(50))
+
+    def test_get_range_querysets(self):
+        querysets = Item.objects.filter(even=True).get_range_querysets(4)
+        self.assertEqual(len(querysets), 4)
+        self.assertEqual(querysets[0].get_filters(),
+            {'even': True, '_id': {'$lt': 12}})
+        self.assertEqual(sorted(sum([list(queryset.pluck('number'))
+            for queryset in querysets], [])), range(0, 50, 2))
+
+    def test_range_is_kept_by_filter(self):
+        queryset = Item.objects.all().get_range_querysets(4)[0].filter(
+            even=True)
+        self.assertEqual(queryset.get_filters(),
+            {'even': True, '_id': {'$lt': 12}})
+        self.assertEqual(list(queryset.pluck('number')), range(0, 12, 2))
+
+    def test_get_id_ranges_without_documents(self):
+        self.assertEqual(Item.objects.filter(number=100).get_id_ranges(4),
+            [(None, None)])
+
+    def test_parallel_iter(self):
+        items = list(Item.objects.filter(even=False).parallel_iter(workers=3,
+            queue_size=2))
+        self.assertTrue(all(isinstance(item, Item) for item in items))
+        self.assertEqual(sorted(item.data['number'] for item in items),
+            range(1, 50, 2))
+
+    def test_parallel_iter_may_be_abandoned(self):
+        iterator = Item.objects.all().parallel_iter(workers=2, queue_size=1)
+        self.assertIsInstance(iterator.next(), Item)
+        iterator.close()
+
+    def test_sliced_queryset(self):
+        with self.assertRaises(TypeError):
+            Item.objects.all()[:10].parallel_iter()
+
+    def test_queryset_after_key(self):
+        queryset = Item.objects.all().order_by('number').after((10, 10))
+        with self.assertRaises(TypeError):
+            queryset.parallel_iter()
+        with self.assertRaises(TypeError):
+            queryset.parallel_map(get_number)
+
+    def test_parallel_map_threads(self):
+        self.assertEqual(sorted(Item.objects.filter(number__lt=10)
+            .parallel_map(get_number, workers=2, processes=False)), range(10))
+
+    def test_parallel_map_processes(self):
+        self.assertEqual(sorted(Item.objects.filter(number__gte=40)
+            .parallel_map(get_number, workers=2)), range(40, 50))
+
+    def test_parallel_map_processes_in_chunks(self):
+        self.assertEqual(sorted(Item.objects.filter(even=True).batch_size(2)
+            .parallel_map(get_number, workers=2, chunk_size=3)),
+            range(0, 50, 2))
+
+    def test_map_chunk(self):
+        queryset = Item.objects.filter(number__lt=5).order_by('_id')
+        self.assertEqual(_map_chunk(queryset, get_number, 3, None),
+            ([0, 1, 2], (2,)))
+        self.assertEqual(_map_chunk(queryset, get_number, 3, (2,)),
+            ([3, 4], None))
+
+    def test_values_are_not_mapped_in_processes(self):
+        with self.assertRaises(TypeError):
+            Item.objects.values('number').parallel_map(get_number)
+
+    def test_worker_resets_connections(self):
+        lock = shared_connections.lock
+        self.addCleanup(setattr, shared_connections, 'lock', lock)
+        self.addCleanup(setattr, shared_connections, 'connections',
+            shared_connections.connections)
+        lock.acquire()
+        try:
+            _init_worker()
+            self.assertIsNot(shared_connections.lock, lock)
+            self.assertEqual(shared_connections.connections, {})
+        finally:
+            lock.release()
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            list(Item.objects.all().parallel_map(fail, workers=2,
+                processes=False))
+        with self.assertRaises(ValueError):
+            list(Item.objects.all().parallel_map(fail, workers=2))
+
+    def test_pickling_errors_are_raised(self):
+        with self.assertRaises(cPickle.PicklingError):
+            list(Item.objects.all().parallel_map(lambda item: item,
+                workers=2))
+        with self.assertRaises(MaybeEncodingError):
+            list(Item.objects.all().parallel_map(get_callback, workers=2))
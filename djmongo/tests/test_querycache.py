@@ -0,0 +1,162 @@
+from bson import ObjectId
+from django.core.cache import get_cache
+from django.core.exceptions import ImproperlyConfigured
+from djmongo.aggregates import Count
+from djmongo.compat import override_settings
+from djmongo.document import Document
+from djmongo.lookups import compile_filters
+from djmongo.querycache import bump_generation
+from djmongo.querycache import get_cache_key
+from djmongo.querycache import get_generation
+from djmongo.querycache import get_generation_key
+from djmongo.querycache import get_query_cache
+from djmongo.querycache import serialize_query
+from djmongo.querysets import QuerySet
+from djmongo.test import TestCase
+from mock import patch
+import re
+
+
+class Item(Document):
+    class Meta:
+        using = 'mongodb'
+        query_cache = True
+
+
+class UncachedItem(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestGeneration(TestCase):
+
+    def setUp(self):
+        get_query_cache().clear()
+
+    def test_bump_generation(self):
+        generation = get_generation('foo')
+        self.assertEqual(get_generation('foo'), generation)
+        bump_generation('foo')
+        self.assertEqual(get_generation('foo'), generation + 1)
+
+    def test_bump_missing_generation(self):
+        bump_generation('foo')
+        self.assertIsNotNone(get_query_cache().get(get_generation_key('foo')))
+
+    def test_get_cache_key(self):
+        key = get_cache_key('foo', ('find', {'a': 1}))
+        self.assertEqual(get_cache_key('foo', ('find', {'a': 1})), key)
+        self.assertNotEqual(get_cache_key('foo', ('find', {'a': 2})), key)
+        self.assertNotEqual(get_cache_key('bar', ('find', {'a': 1})), key)
+        bump_generation('foo')
+        self.assertNotEqual(get_cache_key('foo', ('find', {'a': 1})), key)
+
+    def test_get_cache_key_for_regular_expressions(self):
+        query = ('find', compile_filters({'title__startswith': 'Sla'}))
+        key = get_cache_key('foo', query)
+        self.assertEqual(get_cache_key('foo', ('find', compile_filters(
+            {'title__startswith': 'Sla'}))), key)
+        self.assertNotEqual(get_cache_key('foo', ('find', compile_filters(
+            {'title__istartswith': 'Sla'}))), key)
+        self.assertNotEqual(get_cache_key('foo', ('find', compile_filters(
+            {'title__startswith': 'Sab'}))), key)
+
+    def test_serialize_query_is_deterministic(self):
+        query = {'b': [ObjectId('5' * 24)], 'a': {'$regex': re.compile('x')}}
+        self.assertEqual(serialize_query(query),
+            serialize_query(dict(reversed(query.items()))))
+        self.assertNotIn(' at 0x', serialize_query(query))
+
+
+class TestQuerySetCache(TestCase):
+
+    def setUp(self):
+        get_query_cache().clear()
+        for x in range(5):
+            Item.objects.create(data={'number': x, 'even': x % 2 == 0})
+
+    def insert_raw(self, data):
+        # bypasses djmongo, so cached results are not invalidated
+        Item.objects.db[Item._meta.collection_name].insert(data)
+
+    def test_results_are_cached(self):
+        queryset = Item.objects.filter(even=True).order_by('number').cache(60)
+        self.assertEqual([item.data['number'] for item in queryset],
+            [0, 2, 4])
+        self.assertEqual(queryset.count(), 3)
+        with patch.object(QuerySet, 'get_items') as get_items:
+            self.assertEqual([item.data['number'] for item in
+                queryset.filter()], [0, 2, 4])
+            self.assertEqual(queryset.count(), 3)
+            self.assertFalse(get_items.called)
+
+    def test_queries_are_cached_separately(self):
+        queryset = Item.objects.all().order_by('number').cache()
+        self.assertEqual(len(list(queryset)), 5)
+        self.assertEqual(len(list(queryset[1:3])), 2)
+        self.assertEqual(len(list(queryset.filter(even=False))), 2)
+        self.assertEqual(list(queryset.values('number')[:1]), [{'number': 0}])
+        self.assertItemsEqual(list(queryset.only('even')[:1])[0].data.keys(),
+            ['_id', 'even'])
+
+    def test_uncached_querysets(self):
+        self.assertEqual(Item.objects.count(), 5)
+        self.insert_raw({'number': 5})
+        self.assertEqual(Item.objects.count(), 6)
+        self.assertEqual(len(list(Item.objects.all())), 6)
+
+    def test_writes_invalidate_results(self):
+        queryset = Item.objects.filter(even=True).cache()
+        self.assertEqual(len(list(queryset)), 3)
+        self.insert_raw({'number': 6, 'even': True})
+        self.assertEqual(len(list(queryset.filter())), 3)
+        Item.objects.create(data={'number': 8, 'even': True})
+        self.assertEqual(len(list(queryset.filter())), 5)
+        Item.objects.filter(number=8).update(even=False)
+        self.assertEqual(len(list(queryset.filter())), 4)
+        item = Item.objects.get(number=6)
+        item.delete()
+        self.assertEqual(len(list(queryset.filter())), 3)
+        Item.objects.upsert({'number': 10, 'even': True}, number=10)
+        self.assertEqual(queryset.count(), 4)
+
+    def test_regex_filters_are_cached(self):
+        queryset = Item.objects.filter(title__startswith='a').cache()
+        self.assertEqual(list(queryset), [])
+        with patch.object(QuerySet, 'get_items') as get_items:
+            self.assertEqual(list(Item.objects.filter(
+                title__startswith='a').cache()), [])
+            self.assertFalse(get_items.called)
+
+    def test_cache_has_to_be_enabled(self):
+        with self.assertRaises(ImproperlyConfigured):
+            UncachedItem.objects.all().cache()
+
+    def test_writes_to_uncached_documents_skip_cache(self):
+        with patch('djmongo.querycache.bump_generation') as bump:
+            item = UncachedItem.objects.create(data={'number': 1})
+            UncachedItem.objects.filter(number=1).update(number=2)
+            item.delete()
+            self.assertFalse(bump.called)
+            Item.objects.create(data={'number': 1})
+            self.assertTrue(bump.called)
+
+    def test_annotations_are_cached(self):
+        queryset = Item.objects.values('even').annotate(count=Count()).cache()
+        self.assertItemsEqual(list(queryset), [{'even': True, 'count': 3},
+            {'even': False, 'count': 2}])
+        self.insert_raw({'number': 5, 'even': False})
+        self.assertItemsEqual(list(queryset.filter()),
+            [{'even': True, 'count': 3}, {'even': False, 'count': 2}])
+
+    @override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'queries': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'queries'}}, MONGODB_CACHE_ALIAS='queries')
+    def test_cache_alias(self):
+        get_cache('default').clear()
+        list(Item.objects.all().cache())
+        key = get_generation_key(Item._meta.collection_name)
+        self.assertIsNotNone(get_cache('queries').get(key))
+        self.assertIsNone(get_cache('default').get(key))
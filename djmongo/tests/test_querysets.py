@@ -1,8 +1,12 @@
+from djmongo.aggregates import Count
 from djmongo.document import Document
 from djmongo.exceptions import MultipleItemsReturnedError
 from djmongo.querysets import QuerySet
 from djmongo.test import TestCase
+from mock import MagicMock
 from mock import Mock
+from mock import patch
+import pymongo
 
 
 class Item(Document):
@@ -219,3 +223,390 @@ class TestQuerySet(TestCase):
         item = Item.objects.get(id=101)
         self.assertEqual(item.id, result['upserted'])
 
+
+    def test_pluck_fetches_only_requested_fields(self):
+        queryset = QuerySet(Item)
+        queryset.get_items = Mock(return_value=[])
+        list(queryset.pluck('id', 'number'))
+        queryset.get_items.assert_called_once_with(
+            fields={'id': True, 'number': True, '_id': False})
+
+    def test_only(self):
+        item = QuerySet(Item).only('id').get(id=3)
+        self.assertItemsEqual(item.data.keys(), ['_id', 'id'])
+
+    def test_only_is_chainable(self):
+        queryset = QuerySet(Item).only('id', 'number')
+        self.assertEqual(queryset.filter(id=3).get_projection(),
+            {'id': True, 'number': True})
+        self.assertIsNone(QuerySet(Item).get_projection())
+
+    def test_defer(self):
+        item = QuerySet(Item).defer('number').get(id=3)
+        self.assertItemsEqual(item.data.keys(), ['_id', 'id'])
+
+    def test_only_and_defer(self):
+        queryset = QuerySet(Item).only('id', 'number').defer('number')
+        self.assertEqual(queryset.get_projection(), {'id': True})
+
+    def test_results_are_cached(self):
+        queryset = QuerySet(Item).order_by('id')
+        get_items = queryset.get_items
+        queryset.get_items = Mock(side_effect=get_items)
+        queryset.count = Mock()
+
+        self.assertTrue(queryset)
+        self.assertEqual(len(queryset), 30)
+        self.assertEqual(queryset[1].data['id'], 2)
+        self.assertEqual([item.data['id'] for item in queryset], range(1, 31))
+        self.assertEqual([item.data['id'] for item in queryset], range(1, 31))
+
+        self.assertEqual(queryset.get_items.call_count, 1)
+        self.assertFalse(queryset.count.called)
+
+    def test_bool_of_empty_queryset(self):
+        self.assertFalse(QuerySet(Item).filter(id=301))
+
+    def test_clones_are_not_cached(self):
+        queryset = QuerySet(Item).order_by('id')
+        list(queryset)
+        self.assertIsNone(queryset.filter(number=1)._result_cache)
+        self.assertIsNone(queryset.order_by('number')._result_cache)
+        self.assertIsNone(queryset[:5]._result_cache)
+        self.assertEqual(len(list(queryset[:5])), 5)
+
+    def test_all_fetches_results_again(self):
+        queryset = QuerySet(Item).filter(number=1)
+        count = len(list(queryset.all()))
+        Item.objects.create(data={'id': 31, 'number': 1})
+        self.assertEqual(len(list(queryset.all())), count + 1)
+        self.assertIsNone(queryset._result_cache)
+
+    def test_get_fetches_at_most_two_items(self):
+        queryset = QuerySet(Item).order_by('id')
+        with patch.object(QuerySet, 'get_items') as get_items:
+            get_items.return_value = [{'id': 2}, {'id': 12}]
+            with self.assertRaises(MultipleItemsReturnedError):
+                queryset.get(number=2)
+        self.assertEqual(get_items.call_count, 1)
+
+    def test_get_limit_and_ordering(self):
+        queryset = QuerySet(Item).order_by('id')
+        with patch.object(QuerySet, 'collection') as collection:
+            cursor = collection.find.return_value = MagicMock()
+            with self.assertRaises(Item.DoesNotExist):
+                queryset.get(id=2)
+        cursor.limit.assert_called_once_with(2)
+        self.assertFalse(cursor.sort.called)
+
+    def test_get_or_none(self):
+        self.assertEqual(QuerySet(Item).get_or_none(id=2).data['id'], 2)
+        self.assertIsNone(QuerySet(Item).get_or_none(id=301))
+
+    def test_first(self):
+        self.assertEqual(QuerySet(Item).order_by('-id').first().data['id'], 30)
+        self.assertEqual(QuerySet(Item).filter(number=3).order_by('id')
+            .first().data['id'], 3)
+        self.assertIsNone(QuerySet(Item).filter(id=301).first())
+
+    def test_first_without_ordering_uses_id(self):
+        first = QuerySet(Item).first()
+        self.assertEqual(first.id, min(QuerySet(Item).pluck('_id')))
+
+    def test_last(self):
+        self.assertEqual(QuerySet(Item).order_by('id').last().data['id'], 30)
+        self.assertEqual(QuerySet(Item).order_by('-id').last().data['id'], 1)
+        self.assertEqual(QuerySet(Item).order_by('id')[:5].last().data['id'],
+            5)
+        self.assertIsNone(QuerySet(Item).filter(id=301).last())
+
+    def test_exists(self):
+        self.assertTrue(QuerySet(Item).exists())
+        self.assertTrue(QuerySet(Item).filter(id=2).exists())
+        self.assertFalse(QuerySet(Item).filter(id=301).exists())
+
+    def test_exists_fetches_only_id(self):
+        queryset = QuerySet(Item).filter(id=2)
+        get_items = queryset.get_items
+        with patch.object(QuerySet, 'get_items') as m:
+            m.side_effect = get_items
+            queryset.exists()
+            m.assert_called_once_with(fields={'_id': True})
+
+    def test_filter_does_not_change_original_queryset(self):
+        queryset = QuerySet(Item).filter(number=1).order_by('id')
+        queryset.filter(id__in=[1, 11]).order_by('-number')
+        self.assertEqual(queryset._filters, {'number': 1})
+        self.assertEqual(queryset._ordering, ['id'])
+        self.assertEqual(queryset.get_filters(), {'number': 1})
+
+    def test_get_filters_does_not_change_filters(self):
+        queryset = QuerySet(Item).filter(id__in=[1, 2], number__gt=0)
+        self.assertEqual(queryset.get_filters(),
+            {'id': {'$in': [1, 2]}, 'number': {'$gt': 0}})
+        self.assertEqual(queryset._filters, {'id__in': [1, 2], 'number__gt': 0})
+        self.assertItemsEqual(queryset.pluck('id'), [1, 2])
+        self.assertItemsEqual(queryset.pluck('id'), [1, 2])
+
+    def test_get_filters_is_memoized(self):
+        queryset = QuerySet(Item).filter(id__in=[1, 2])
+        self.assertIs(queryset.get_filters(), queryset.get_filters())
+        self.assertIs(queryset.order_by('id').get_filters(),
+            queryset.get_filters())
+        self.assertEqual(queryset.filter(number=1).get_filters(),
+            {'id': {'$in': [1, 2]}, 'number': 1})
+
+    def test_clone_keeps_class(self):
+
+        class CustomQuerySet(QuerySet):
+            pass
+
+        queryset = CustomQuerySet(Item)
+        self.assertIsInstance(queryset.filter(id=1).order_by('id')[:1],
+            CustomQuerySet)
+
+    def test_filter_range_on_single_field(self):
+        queryset = QuerySet(Item)
+        self.assertItemsEqual(queryset.filter(id__gte=5, id__lt=8).pluck('id'),
+            [5, 6, 7])
+
+    def test_filter_startswith(self):
+        Item.objects.collection.drop()
+        Item.objects.create(data={'title': 'Metallica'})
+        Item.objects.create(data={'title': 'metal.com'})
+        Item.objects.create(data={'title': 'Heavy Metal'})
+        queryset = QuerySet(Item)
+
+        self.assertItemsEqual(queryset.filter(title__startswith='Metal')
+            .pluck('title'), ['Metallica'])
+        self.assertItemsEqual(queryset.filter(title__istartswith='metal')
+            .pluck('title'), ['Metallica', 'metal.com'])
+        self.assertItemsEqual(queryset.filter(title__startswith='metal.')
+            .pluck('title'), ['metal.com'])
+
+    def test_filter_dotted_path(self):
+        Item.objects.collection.drop()
+        Item.objects.create(data={'id': 1, 'author': {'name': 'Joe'}})
+        Item.objects.create(data={'id': 2, 'author': {'name': 'Jane'}})
+        self.assertItemsEqual(QuerySet(Item).filter(author__name='Joe')
+            .pluck('id'), [1])
+
+    def test_filter_contains_escapes_value(self):
+        Item.objects.collection.drop()
+        Item.objects.create(data={'title': 'a.b'})
+        Item.objects.create(data={'title': 'axb'})
+        self.assertItemsEqual(QuerySet(Item).filter(title__contains='.')
+            .pluck('title'), ['a.b'])
+        self.assertItemsEqual(QuerySet(Item).filter(title__icontains='A.')
+            .pluck('title'), ['a.b'])
+
+    def test_search(self):
+        queryset = QuerySet(Item).filter(number=1).search('metal')
+        self.assertEqual(queryset.get_filters(),
+            {'number': 1, '$text': {'$search': 'metal'}})
+        self.assertEqual(QuerySet(Item).search('metal', language='en')
+            .get_filters(), {'$text': {'$search': 'metal', '$language': 'en'}})
+
+    def test_get_keyset_queryset_adds_id(self):
+        self.assertEqual(QuerySet(Item).get_keyset_queryset()._ordering,
+            ['_id'])
+        self.assertEqual(QuerySet(Item).order_by('-number')
+            .get_keyset_queryset()._ordering, ['-number', '-_id'])
+        self.assertEqual(QuerySet(Item).order_by('_id').order_by('number')
+            .get_keyset_queryset()._ordering, ['_id', 'number'])
+
+    def test_after_filters(self):
+        queryset = QuerySet(Item).filter(id__gt=0).order_by('number').after(
+            (3, 'abc'))
+        self.assertEqual(queryset.get_filters(), {
+            'id': {'$gt': 0},
+            '$or': [
+                {'number': {'$gt': 3}},
+                {'number': 3, '_id': {'$gt': 'abc'}},
+            ],
+        })
+        self.assertEqual(QuerySet(Item).after(('abc',)).get_filters(),
+            {'_id': {'$gt': 'abc'}})
+        self.assertEqual(QuerySet(Item).order_by('-_id').after(('abc',))
+            .get_filters(), {'_id': {'$lt': 'abc'}})
+
+    def test_after_filters_for_missing_values(self):
+        self.assertEqual(QuerySet(Item).order_by('number').after(
+            (None, 'abc')).get_filters(), {'$or': [
+                {'number': {'$ne': None}},
+                {'number': None, '_id': {'$gt': 'abc'}},
+            ]})
+        self.assertEqual(QuerySet(Item).order_by('-number').after(
+            (3, 'abc')).get_filters(), {'$or': [
+                {'$or': [{'number': {'$lt': 3}}, {'number': None}]},
+                {'number': 3, '_id': {'$lt': 'abc'}},
+            ]})
+        self.assertEqual(QuerySet(Item).order_by('-number').after(
+            (None, 'abc')).get_filters(),
+            {'number': None, '_id': {'$lt': 'abc'}})
+
+    def test_after_requires_key_for_each_ordering_field(self):
+        with self.assertRaises(ValueError):
+            QuerySet(Item).order_by('number').after(('abc',))
+
+    def test_order_by_drops_after(self):
+        queryset = QuerySet(Item).order_by('number').after((3, 'abc'))
+        queryset = queryset.order_by('id')
+        self.assertIsNone(queryset._after)
+        self.assertEqual(queryset.get_filters(), {})
+
+    def test_after(self):
+        queryset = QuerySet(Item).order_by('number').order_by('id')
+        item = queryset.get(id=15)
+        self.assertEqual(queryset.get_sort_key(item), (5, 15, item.id))
+        self.assertEqual(list(queryset.after(item)[:3].pluck('id')),
+            [25, 6, 16])
+
+    def test_paginate_by_key(self):
+        queryset = QuerySet(Item).order_by('-number').order_by('id')
+        ids = []
+        items, next_key = queryset.paginate_by_key(7)
+        while next_key is not None:
+            self.assertEqual(len(items), 7)
+            ids.extend(item.data['id'] for item in items)
+            items, next_key = queryset.paginate_by_key(7, after=next_key)
+        ids.extend(item.data['id'] for item in items)
+        self.assertEqual(ids, list(queryset.pluck('id')))
+        self.assertEqual(len(ids), 30)
+
+    def test_paginate_by_key_with_missing_values(self):
+        for x in range(31, 36):
+            Item.objects.create(data={'id': x})
+        for ordering in ('number', '-number'):
+            queryset = QuerySet(Item).order_by(ordering)
+            ids = []
+            items, next_key = queryset.paginate_by_key(4)
+            while next_key is not None:
+                ids.extend(item.data['id'] for item in items)
+                items, next_key = queryset.paginate_by_key(4, after=next_key)
+            ids.extend(item.data['id'] for item in items)
+            self.assertItemsEqual(ids, range(1, 36))
+
+    def test_update_operators(self):
+        QuerySet(Item).filter(id__in=[1, 2]).update(inc__number=10,
+            push__tags='new', set__title='foo')
+        self.assertItemsEqual(QuerySet(Item).filter(id__in=[1, 2, 3]).pluck(
+            'id', 'number', 'tags', 'title'), [
+            (1, 11, ['new'], 'foo'),
+            (2, 12, ['new'], 'foo'),
+            (3, 3, None, None),
+        ])
+
+    def test_update_unset(self):
+        QuerySet(Item).filter(id=1).update(unset__number=True)
+        self.assertNotIn('number', Item.objects.get(id=1).data)
+
+    def test_delete(self):
+        QuerySet(Item).filter(number__in=[1, 2]).delete()
+        self.assertEqual(QuerySet(Item).count(), 24)
+        self.assertFalse(QuerySet(Item).filter(number=1).exists())
+
+    def test_delete_is_single_request(self):
+        with patch.object(QuerySet, 'collection') as collection:
+            QuerySet(Item).filter(number=1).delete()
+            collection.remove.assert_called_once_with({'number': 1}, safe=True)
+
+    def test_delete_sliced_raises(self):
+        with self.assertRaises(TypeError):
+            QuerySet(Item)[:5].delete()
+
+    def test_update_sliced_raises(self):
+        with self.assertRaises(TypeError):
+            QuerySet(Item)[:5].update(number=1)
+        self.assertEqual(QuerySet(Item).filter(number=1).count(), 3)
+
+    def test_iterator_does_not_cache(self):
+        queryset = QuerySet(Item).order_by('id')
+        self.assertEqual([item.data['id'] for item in queryset.iterator()],
+            range(1, 31))
+        self.assertIsNone(queryset._result_cache)
+
+    def test_cursor_options(self):
+        queryset = QuerySet(Item).filter(number=1).batch_size(100).timeout(
+            500).no_timeout()
+        with patch.object(QuerySet, 'collection') as collection:
+            cursor = collection.find.return_value
+            queryset.get_items()
+            collection.find.assert_called_once_with({'number': 1},
+                fields=None, timeout=False)
+            cursor.batch_size.assert_called_once_with(100)
+            cursor.max_time_ms.assert_called_once_with(500)
+
+    def test_iterator_exhaust(self):
+        queryset = QuerySet(Item)
+        with patch.object(QuerySet, 'collection') as collection:
+            collection.find.return_value = MagicMock()
+            list(queryset.iterator(exhaust=True))
+            collection.find.assert_called_once_with({}, fields=None,
+                exhaust=True)
+        self.assertEqual(queryset._find_options, {})
+
+    def test_cursor_options_are_cloned(self):
+        queryset = QuerySet(Item).batch_size(10).no_timeout()
+        clone = queryset.filter(number=1)
+        self.assertEqual(clone._batch_size, 10)
+        self.assertEqual(clone._find_options, {'timeout': False})
+        self.assertIsNot(clone._find_options, queryset._find_options)
+
+    def test_using_read_preference(self):
+        queryset = QuerySet(Item).filter(number=1).using_read_preference(
+            'secondary_preferred', tag_sets=[{'dc': 'east'}])
+        with patch.object(QuerySet, 'collection') as collection:
+            queryset.get_items()
+            collection.find.assert_called_once_with({'number': 1},
+                fields=None,
+                read_preference=pymongo.ReadPreference.SECONDARY_PREFERRED,
+                tag_sets=[{'dc': 'east'}])
+
+    def test_using_read_preference_for_aggregation(self):
+        queryset = QuerySet(Item).using_read_preference(
+            pymongo.ReadPreference.SECONDARY).no_timeout()
+        with patch.object(QuerySet, 'collection') as collection:
+            queryset.aggregate(count=Count())
+            self.assertEqual(collection.aggregate.call_args[1], {'cursor': {},
+                'read_preference': pymongo.ReadPreference.SECONDARY})
+
+
+class Author(Document):
+    class Meta:
+        using = 'mongodb'
+
+
+class TestSelectRelatedIds(TestCase):
+
+    def setUp(self):
+        self.joe = Author.objects.create(data={'name': 'Joe'})
+        self.ann = Author.objects.create(data={'name': 'Ann'})
+        Item.objects.create(data={'number': 1, 'author_id': self.joe.id,
+            'reviewers': [self.ann.id, self.joe.id]})
+        Item.objects.create(data={'number': 2, 'author_id': self.ann.id,
+            'reviewers': []})
+        Item.objects.create(data={'number': 3, 'author_id': 'missing'})
+
+    def test_select_related_ids(self):
+        items = list(Item.objects.all().order_by('number').select_related_ids(
+            'author_id', document=Author).select_related_ids('reviewers',
+            document=Author, to_attr='reviewed_by'))
+        self.assertEqual([item.author for item in items],
+            [self.joe, self.ann, None])
+        self.assertEqual(items[0].reviewed_by, [self.ann, self.joe])
+        self.assertEqual(items[1].reviewed_by, [])
+        self.assertIsNone(items[2].reviewed_by)
+
+    def test_single_query_per_document(self):
+        queryset = Item.objects.all().select_related_ids('author_id',
+            document=Author).select_related_ids('reviewers', document=Author)
+        with patch.object(Author.objects, 'in_bulk') as in_bulk:
+            in_bulk.return_value = {}
+            list(queryset)
+            self.assertEqual(in_bulk.call_count, 1)
+
+    def test_default_attribute(self):
+        item = Item.objects.all().select_related_ids('reviewers',
+            document=Author).filter(number=1)[0]
+        self.assertEqual(item.reviewers_document, [self.ann, self.joe])
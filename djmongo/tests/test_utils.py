@@ -1,6 +1,9 @@
 from django.conf import settings
 from djmongo.test import TestCase
 from djmongo.utils import can_drop_collection
+from djmongo.utils import get_changes
+from djmongo.utils import get_read_preference
+import pymongo
 
 class TestCanDropCollection(TestCase):
 
@@ -17,3 +20,53 @@ class TestCanDropCollection(TestCase):
         self.assertTrue(can_drop_collection('%s.%s' % (prefix, 'system')))
         self.assertTrue(can_drop_collection('%s.%s' % (prefix, 'system.users')))
 
+
+class TestGetChanges(TestCase):
+
+    def test_no_changes(self):
+        data = {'foo': 'bar', 'nested': {'a': [1, 2]}}
+        self.assertEqual(get_changes(data, data.copy()), ({}, {}))
+
+    def test_changed_and_added_keys(self):
+        self.assertEqual(get_changes({'foo': 'bar', 'count': 1},
+            {'foo': 'bar', 'count': 2, 'new': 'value'}),
+            ({'count': 2, 'new': 'value'}, {}))
+
+    def test_removed_keys(self):
+        self.assertEqual(get_changes({'foo': 'bar', 'baz': 1}, {'foo': 'bar'}),
+            ({}, {'baz': 1}))
+
+    def test_nested_dicts_use_dotted_paths(self):
+        old = {'stats': {'views': 1, 'likes': 2, 'extra': 0}}
+        new = {'stats': {'views': 2, 'likes': 2, 'shares': 1}}
+        self.assertEqual(get_changes(old, new),
+            ({'stats.views': 2, 'stats.shares': 1}, {'stats.extra': 1}))
+
+    def test_lists_are_replaced_as_a_whole(self):
+        self.assertEqual(get_changes({'tags': ['a', 'b']},
+            {'tags': ['a', 'b', 'c']}), ({'tags': ['a', 'b', 'c']}, {}))
+
+    def test_type_changes_are_detected(self):
+        self.assertEqual(get_changes({'flag': 1}, {'flag': True}),
+            ({'flag': True}, {}))
+
+    def test_equal_strings_and_integers_are_not_changes(self):
+        self.assertEqual(get_changes({'title': u'Slayer', 'plays': 1L},
+            {'title': 'Slayer', 'plays': 1}), ({}, {}))
+
+
+class TestGetReadPreference(TestCase):
+
+    def test_mode_is_returned_as_is(self):
+        self.assertEqual(get_read_preference(pymongo.ReadPreference.SECONDARY),
+            pymongo.ReadPreference.SECONDARY)
+
+    def test_name(self):
+        self.assertEqual(get_read_preference('secondary_preferred'),
+            pymongo.ReadPreference.SECONDARY_PREFERRED)
+        self.assertEqual(get_read_preference('NEAREST'),
+            pymongo.ReadPreference.NEAREST)
+
+    def test_unknown_name(self):
+        with self.assertRaises(ValueError):
+            get_read_preference('anywhere')
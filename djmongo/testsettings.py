@@ -14,8 +14,13 @@ DATABASES = {
 }
 
 INSTALLED_APPS = (
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.admin',
     'djmongo',
 )
 
+ROOT_URLCONF = 'djmongo.testurls'
+
 MONGODB_COLLECTIONS_PREFIX = 'djmongo.tests'
 
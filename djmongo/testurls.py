@@ -0,0 +1,8 @@
+from django.conf.urls.defaults import include
+from django.conf.urls.defaults import patterns
+from django.contrib import admin
+
+
+urlpatterns = patterns('',
+    (r'^admin/', include(admin.site.urls)),
+)
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import connections
+import pymongo
 
 
 def is_mongodb_connection(connection):
@@ -15,3 +16,72 @@ def can_drop_collection(collection_name):
     return (collection_name.startswith(settings.MONGODB_COLLECTIONS_PREFIX) and
             not collection_name.startswith('system.'))
 
+
+def get_changes(old, new, prefix=''):
+    """
+    Compares ``old`` and ``new`` data dictionaries and returns ``(set_data,
+    unset_data)`` pair of dictionaries which may be used as ``$set`` and
+    ``$unset`` parts of an update. Nested dictionaries are compared key by
+    key (changes are reported with dotted paths), any other values (including
+    lists) are replaced as a whole.
+    """
+    set_data, unset_data = {}, {}
+    for key, value in new.iteritems():
+        path = prefix + key
+        if key not in old:
+            set_data[path] = value
+            continue
+        old_value = old[key]
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            nested_set, nested_unset = get_changes(old_value, value,
+                path + '.')
+            set_data.update(nested_set)
+            unset_data.update(nested_unset)
+        elif not is_same_value(old_value, value):
+            set_data[path] = value
+    for key in old:
+        if key not in new:
+            unset_data[prefix + key] = 1
+    return set_data, unset_data
+
+
+def is_same_value(old, new):
+    """
+    Returns ``True`` if ``old`` and ``new`` values are stored the same way.
+    ``str`` and ``unicode`` (or ``int`` and ``long``) values are compared by
+    value, other values have to be of the same type as well, so that i.e.
+    ``1`` changed to ``True`` is reported.
+    """
+    if isinstance(old, basestring) and isinstance(new, basestring):
+        return old == new
+    numbers = (int, long)
+    if (isinstance(old, numbers) and isinstance(new, numbers) and
+        not isinstance(old, bool) and not isinstance(new, bool)):
+        return old == new
+    return type(old) == type(new) and old == new
+
+
+def get_path(data, path):
+    """
+    Returns value stored at dotted ``path`` of ``data`` dictionary (or
+    ``None`` if there is no such value).
+    """
+    for part in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def get_read_preference(value):
+    """
+    Returns pymongo's read preference for given ``value`` - which may be one
+    of ``pymongo.ReadPreference`` modes or its name (i.e.
+    ``'secondary_preferred'``).
+    """
+    if isinstance(value, basestring):
+        try:
+            return getattr(pymongo.ReadPreference, value.upper())
+        except AttributeError:
+            raise ValueError("Unknown read preference: %r" % value)
+    return value
@@ -28,8 +28,11 @@ setup(
     license = 'BSD',
     install_requires = [
         'Django>=1.3',
-        'pymongo>=2.1.1',
+        'pymongo>=2.7',
     ],
+    extras_require = {
+        'nonblocking': ['motor>=0.4,<1.0'],
+    },
     classifiers = ['Development Status :: 5 - Production/Stable',
                    'Environment :: Web Environment',
                    'Framework :: Django',